@@ -0,0 +1,136 @@
+"""
+Shared helpers of the benchmark scripts
+"""
+
+import glob
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type
+
+from scrapy import Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.project import data_path, get_project_settings
+
+from hk_climb_price.archive import ResponseArchive
+
+# Metrics, or suffixes of metrics, where a higher value is a regression
+LOWER_IS_BETTER = (
+    "mean_us",
+    "p95_us",
+    "p99_us",
+    "startup_us",
+    "import_us",
+    "wall_us",
+    "xpath_evals",
+    "peak_bytes",
+    "bytes",
+    "bytes_per_item",
+)
+
+
+def measure(func: Callable[[], Any], repeat: int = 200) -> Dict[str, float]:
+    """Time repeated calls of func
+
+    Returns:
+        Dict[str, float]: mean and 95th percentile in microseconds
+    """
+    func()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        "mean_us": round(statistics.mean(timings), 2),
+        "p95_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+    }
+
+
+def peak_allocation(func: Callable[[], Any]) -> int:
+    """
+    Peak traced memory in bytes of a single call of func
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def load_response(
+    spider_cls: Type[Spider], html_path: Optional[str] = None
+) -> Optional[HtmlResponse]:
+    """Price page of a spider, from a saved html file or the response archive
+
+    Returns:
+        Optional[HtmlResponse]: the page, or None if it was never recorded
+    """
+    url = spider_cls.start_urls[0]
+    if html_path:
+        with open(html_path, "rb") as file:
+            return HtmlResponse(url=url, body=file.read(), encoding="utf-8")
+    archive_dir = data_path(get_project_settings().get("ARCHIVE_DIR"))
+    for response in ResponseArchive.from_spider(archive_dir, spider_cls.name):
+        if isinstance(response, HtmlResponse) and response.status == 200:
+            return response
+    return None
+
+
+def load_records(paths: Sequence[str]) -> List[str]:
+    """
+    Lines of exported json lines files, ``docs/*.json`` by default
+    """
+    records = []
+    for path in paths or sorted(glob.glob("docs/*.json")):
+        with open(path, encoding="utf-8") as file:
+            records.extend(line for line in file if line.strip())
+    return records
+
+
+def save_results(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "timestamp": time.time(),
+                "results": results,
+            },
+            file,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float
+) -> List[str]:
+    """Compare results with a saved run
+
+    Returns:
+        List[str]: description of every metric regressed by more than threshold
+    """
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        for metric, new in sorted(metrics.items()):
+            old = baseline.get(name, {}).get(metric)
+            if old is None or not metric.endswith(LOWER_IS_BETTER):
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(f"{name} {metric}: {old} -> {new}")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    metrics = sorted({metric for values in results.values() for metric in values})
+    width = max(len(name) for name in results) if results else 0
+    print(" ".join([" " * width, *(f"{metric:>12}" for metric in metrics)]))
+    for name, values in sorted(results.items()):
+        cells = (f"{values.get(metric, ''):>12}" for metric in metrics)
+        print(" ".join([f"{name:<{width}}", *cells]))
@@ -0,0 +1,116 @@
+"""
+Benchmark of the canonical gym exporter against the stock json lines exporter
+
+Exports every record of ``docs/*.json`` ``--snapshots`` times::
+
+    python -m benchmarks.exporters --snapshots 100
+"""
+
+import argparse
+import io
+import json
+import random
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from scrapy.exporters import JsonLinesItemExporter
+
+from benchmarks.common import (
+    compare,
+    load_records,
+    measure,
+    print_table,
+    save_results,
+)
+from hk_climb_price import exporters
+from hk_climb_price.exporters import ClimbGymJsonLinesExporter
+from hk_climb_price.items import ClimbGym
+
+
+@contextmanager
+def _serializer(name: str) -> Iterator[None]:
+    orjson = exporters.orjson
+    if name == "json":
+        exporters.orjson = None
+    try:
+        yield
+    finally:
+        exporters.orjson = orjson
+
+
+def export(exporter_cls: type, gyms: Sequence[ClimbGym]) -> bytes:
+    file = io.BytesIO()
+    exporter = exporter_cls(file)
+    exporter.start_exporting()
+    for gym in gyms:
+        exporter.export_item(gym)
+    exporter.finish_exporting()
+    return file.getvalue()
+
+
+def _shuffled(gym: ClimbGym) -> ClimbGym:
+    packages = list(gym.packages)
+    random.Random(0).shuffle(packages)
+    return ClimbGym(
+        name=gym.name, link=gym.link, packages=packages, partial=gym.partial
+    )
+
+
+def run(
+    gyms: Sequence[ClimbGym], snapshots: int, repeat: int
+) -> Dict[str, Dict[str, Any]]:
+    batch = list(gyms) * snapshots
+    shuffled = [_shuffled(gym) for gym in gyms]
+    cases = [("stock", JsonLinesItemExporter, "json")]
+    cases.append(("canonical/json", ClimbGymJsonLinesExporter, "json"))
+    if exporters.orjson is not None:
+        cases.append(("canonical/orjson", ClimbGymJsonLinesExporter, "orjson"))
+    results = {}
+    for name, exporter_cls, serializer in cases:
+        with _serializer(serializer):
+            results[name] = {
+                **measure(lambda: export(exporter_cls, batch), repeat=repeat),
+                "bytes": len(export(exporter_cls, batch)),
+                # Same records with packages in another order
+                "stable": int(
+                    export(exporter_cls, gyms) == export(exporter_cls, shuffled)
+                ),
+            }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "paths", nargs="*", help="exported jsonlines files, default to docs/*.json"
+    )
+    parser.add_argument("--snapshots", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    gyms = []
+    for record in load_records(args.paths):
+        data = json.loads(record)
+        data.setdefault("link", "")
+        gyms.append(ClimbGym.from_dict(data))
+    if not gyms:
+        print("No exported gym records", file=sys.stderr)
+        return 1
+    results = run(gyms, args.snapshots, args.repeat)
+    print_table(results)
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Memory and conversion benchmark of the item classes over exported gym records
+
+Every exported record is loaded ``--snapshots`` times, as a history of crawls
+kept in memory for comparison would be::
+
+    python -m benchmarks.items --snapshots 1000
+"""
+
+import argparse
+import json
+import sys
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmarks.common import (
+    compare,
+    load_records,
+    measure,
+    print_table,
+    save_results,
+)
+from hk_climb_price.items import ClimbGym
+
+
+@dataclass
+class LegacyPackageItem:
+    """
+    Package item as it was before items were slotted, for comparison
+    """
+
+    title: str
+    category: str
+    tags: Sequence[str] = field(default_factory=list)
+    currency_symbol: str = field(default="$")
+    price: int = field(default_factory=int)
+    validity: Optional[str] = field(default=None)
+
+
+LEGACY_FIELDS = tuple(LegacyPackageItem.__dataclass_fields__)
+
+
+@dataclass
+class LegacyClimbGym:
+    name: str
+    link: str
+    packages: Sequence[LegacyPackageItem] = field(default_factory=set)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LegacyClimbGym":
+        return cls(
+            name=data["name"],
+            link=data["link"],
+            packages=[
+                LegacyPackageItem(
+                    **{name: item[name] for name in LEGACY_FIELDS if name in item}
+                )
+                for item in data["packages"]
+            ],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _parse(record: str) -> Dict[str, Any]:
+    data = json.loads(record)
+    data.setdefault("link", "")
+    data.pop("partial", None)
+    return data
+
+
+def retained_bytes(
+    from_dict: Callable[[Dict[str, Any]], Any], records: Sequence[str], snapshots: int
+) -> int:
+    """
+    Memory in bytes held by the items of every snapshot of the records
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        gyms = [
+            from_dict(_parse(record)) for _ in range(snapshots) for record in records
+        ]
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del gyms
+    return retained
+
+
+def run(
+    records: Sequence[str], snapshots: int, repeat: int
+) -> Dict[str, Dict[str, float]]:
+    data = [_parse(record) for record in records]
+    count = snapshots * sum(len(gym["packages"]) for gym in data)
+    results = {}
+    for name, gym_cls in (("legacy", LegacyClimbGym), ("slotted", ClimbGym)):
+        gyms = [gym_cls.from_dict(gym) for gym in data]
+        total = retained_bytes(gym_cls.from_dict, records, snapshots)
+        results[name] = {
+            "bytes": total,
+            "bytes_per_item": round(total / count, 1),
+            **{
+                f"from_dict_{metric}": value
+                for metric, value in measure(
+                    lambda: [gym_cls.from_dict(gym) for gym in data], repeat=repeat
+                ).items()
+            },
+            **{
+                f"to_dict_{metric}": value
+                for metric, value in measure(
+                    lambda: [gym.to_dict() for gym in gyms], repeat=repeat
+                ).items()
+            },
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "paths", nargs="*", help="exported jsonlines files, default to docs/*.json"
+    )
+    parser.add_argument("--snapshots", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    records = load_records(args.paths)
+    if not records:
+        print("No exported gym records", file=sys.stderr)
+        return 1
+    results = run(records, args.snapshots, args.repeat)
+    print_table(results)
+    saved = results["legacy"]["bytes_per_item"] - results["slotted"]["bytes_per_item"]
+    print(f"Saved {saved:.1f} bytes per package")
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Load test of the price query server, requests per second and latencies
+
+Starts the server pinned to one core over ``docs/`` unless ``--port`` is given,
+then sends requests over ``--connections`` keep-alive connections::
+
+    python -m benchmarks.loadtest --duration 10 --connections 16
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.common import compare, print_table, save_results
+from hk_climb_price.server import PriceServer
+
+# Requests sent in turn by every connection, revalidated ones last
+TARGETS = (
+    ("/gyms", None),
+    ("/packages?category=share-pass", None),
+    ("/packages?min_price=100&max_price=1000", None),
+    ("/packages?gym=justclimb&category=day-pass", None),
+    ("/gyms/justclimb", None),
+    ("/packages", "revalidate"),
+)
+
+
+def _serve(docs_dir: str, ports: Any) -> None:
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {0})
+    server = PriceServer(docs_dir)
+    asyncio.run(server.serve("127.0.0.1", 0, lambda address: ports.put(address[1])))
+
+
+async def _request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    target: str,
+    etag: Optional[str],
+) -> Tuple[int, Optional[str]]:
+    headers = f"GET {target} HTTP/1.1\r\nHost: localhost\r\n"
+    if etag:
+        headers += f"If-None-Match: {etag}\r\n"
+    writer.write(f"{headers}\r\n".encode("latin-1"))
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    fields = {}
+    for line in head[1:]:
+        name, _, value = line.partition(":")
+        fields[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(fields.get("content-length", 0)))
+    return int(head[0].split(" ")[1]), fields.get("etag")
+
+
+async def _connection(
+    host: str, port: int, deadline: float, latencies: List[float], statuses: Dict
+) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    etags: Dict[str, Optional[str]] = {}
+    try:
+        while time.perf_counter() < deadline:
+            for target, mode in TARGETS:
+                start = time.perf_counter()
+                status, etag = await _request(
+                    reader, writer, target, etags.get(target) if mode else None
+                )
+                latencies.append((time.perf_counter() - start) * 1e6)
+                statuses[status] = statuses.get(status, 0) + 1
+                etags[target] = etag or etags.get(target)
+    finally:
+        writer.close()
+
+
+async def load(
+    host: str, port: int, connections: int, duration: float
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _connection(host, port, start + duration, latencies, statuses)
+            for _ in range(connections)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "mean_us": round(statistics.mean(latencies), 2),
+        "p99_us": round(
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2
+        ),
+        **{f"status_{status}": count for status, count in sorted(statuses.items())},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs-dir", default="docs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="port of a running server")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    process = None
+    port = args.port
+    if port is None:
+        ports = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_serve, args=(args.docs_dir, ports), daemon=True
+        )
+        process.start()
+        try:
+            port = ports.get(timeout=30)
+        except queue.Empty:
+            print("Server did not start", file=sys.stderr)
+            return 1
+    try:
+        results = {
+            "server": asyncio.run(
+                load(args.host, port, args.connections, args.duration)
+            )
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+    print_table(results)
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Benchmark of the package normalization over exported gym records
+
+Every package of ``docs/*.json`` is normalized ``--snapshots`` times, as many
+crawls would be::
+
+    python -m benchmarks.normalize --snapshots 100
+"""
+
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from benchmarks.common import (
+    compare,
+    load_records,
+    measure,
+    print_table,
+    save_results,
+)
+from hk_climb_price import normalize as normalization
+from hk_climb_price.items import PackageItem
+from hk_climb_price.normalize import normalize
+
+RULES = ("_fields", "duration_days", "audience", "visits", "shareable", "per_month")
+
+
+@contextmanager
+def _uncached() -> Iterator[None]:
+    rules = {name: getattr(normalization, name) for name in RULES}
+    for name, rule in rules.items():
+        setattr(normalization, name, rule.__wrapped__)
+    try:
+        yield
+    finally:
+        for name, rule in rules.items():
+            setattr(normalization, name, rule)
+
+
+def _cold(packages: Sequence[PackageItem]) -> None:
+    normalization.cache_clear()
+    for package in packages:
+        normalize(package)
+
+
+def _warm(packages: Sequence[PackageItem]) -> None:
+    for package in packages:
+        normalize(package)
+
+
+def run(
+    packages: Sequence[PackageItem], snapshots: int, repeat: int
+) -> Dict[str, Dict[str, Any]]:
+    batch = list(packages) * snapshots
+    results = {}
+    with _uncached():
+        results["uncached"] = measure(lambda: _warm(batch), repeat=repeat)
+    results["cold"] = measure(lambda: _cold(batch), repeat=repeat)
+    results["warm"] = measure(lambda: _warm(batch), repeat=repeat)
+    for metrics in results.values():
+        metrics["packages"] = len(batch)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "paths", nargs="*", help="exported jsonlines files, default to docs/*.json"
+    )
+    parser.add_argument("--snapshots", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    packages = [
+        PackageItem.from_dict(package)
+        for record in load_records(args.paths)
+        for package in json.loads(record)["packages"]
+    ]
+    if not packages:
+        print("No exported gym records", file=sys.stderr)
+        return 1
+    results = run(packages, args.snapshots, args.repeat)
+    print_table(results)
+    info = normalization.duration_days.cache_info()
+    print(f"Distinct validity texts: {info.currsize}")
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
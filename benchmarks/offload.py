@@ -0,0 +1,152 @@
+"""
+Throughput of parsing many price pages inline, in threads and in processes
+
+Every archived price page is parsed ``--copies`` times, as many crawled gyms
+or pages would be, in the reactor thread or in the pools of ``PARSE_POOL``::
+
+    python -m benchmarks.offload --workers 4
+    python -m benchmarks.offload --html justclimb=justclimb.html --save offload.json
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Response
+from scrapy.utils.misc import load_object
+from scrapy.utils.project import get_project_settings
+
+from benchmarks.common import compare, load_response, print_table, save_results
+from hk_climb_price import offload
+from hk_climb_price.spiders.atticv import AtticVPriceSpider
+from hk_climb_price.spiders.justclimb import JustclimbPriceSpider
+from hk_climb_price.spiders.vermcity import JustclimbPriceSpider as VermcitySpider
+
+SPIDER_CLASSES = (JustclimbPriceSpider, VermcitySpider, AtticVPriceSpider)
+
+# A page to parse: the spider, and the arguments of offload.parse_in_worker()
+Page = Tuple[Any, Tuple[Any, ...]]
+
+
+def _page(spider: Any, response: Response, settings: Dict[str, Any]) -> Page:
+    spider_cls = type(spider)
+    return spider, (
+        f"{spider_cls.__module__}.{spider_cls.__qualname__}",
+        settings,
+        f"{type(response).__module__}.{type(response).__qualname__}",
+        response.url,
+        response.body,
+        response.encoding,
+        None,
+    )
+
+
+def _parse_inline(page: Page) -> int:
+    spider, args = page
+    response = load_object(args[2])(url=args[3], body=args[4], encoding=args[5])
+    return len(list(spider.parse_page(response)))
+
+
+def _parse_in_worker(args: Tuple[Any, ...]) -> int:
+    items, _, _ = offload.parse_in_worker(*args)
+    return len(items)
+
+
+def run_case(
+    parse_all: Callable[[List[Page]], List[int]], pages: List[Page], repeat: int
+) -> Dict[str, float]:
+    parse_all(pages)  # warm up, and start the workers
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = sum(parse_all(pages))
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "wall_us": round(best * 1e6, 1),
+        "pages_per_s": round(len(pages) / best, 1),
+        "items": items,
+    }
+
+
+def run(
+    gyms: Sequence[str], html: Dict[str, str], copies: int, workers: int, repeat: int
+) -> Dict[str, Dict[str, float]]:
+    settings = get_project_settings()
+    # Every page is parsed, none is re-emitted from its fingerprint
+    settings.set("FINGERPRINT_ENABLED", False)
+    settings_dict = settings.copy_to_dict()
+    pages = []
+    for spider_cls in SPIDER_CLASSES:
+        if gyms and spider_cls.name not in gyms:
+            continue
+        response = load_response(spider_cls, html.get(spider_cls.name))
+        if response is None:
+            print(f"Skip {spider_cls.name}: no archived page", file=sys.stderr)
+            continue
+        spider = spider_cls.from_crawler(Crawler(spider_cls, settings))
+        pages.extend([_page(spider, response, settings_dict)] * copies)
+    if not pages:
+        return {}
+
+    threads = ThreadPoolExecutor(max_workers=workers)
+    processes = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    cases = {
+        "inline": lambda pages: [_parse_inline(page) for page in pages],
+        offload.THREAD: lambda pages: list(threads.map(_parse_inline, pages)),
+        offload.PROCESS: lambda pages: list(
+            processes.map(_parse_in_worker, [args for _, args in pages])
+        ),
+    }
+    try:
+        results = {
+            name: run_case(parse_all, pages, repeat)
+            for name, parse_all in cases.items()
+        }
+    finally:
+        threads.shutdown()
+        processes.shutdown()
+    for result in results.values():
+        result["speedup"] = round(results["inline"]["wall_us"] / result["wall_us"], 2)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("gyms", nargs="*", help="spider names, default to all")
+    parser.add_argument(
+        "--html",
+        action="append",
+        default=[],
+        metavar="GYM=PATH",
+        help="use a saved html page instead of the archive",
+    )
+    parser.add_argument("--copies", type=int, default=20, help="pages per gym")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    html = dict(item.split("=", 1) for item in args.html)
+    results = run(args.gyms, html, args.copies, args.workers, args.repeat)
+    print_table(results)
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Micro-benchmark of every price parser over archived price pages
+
+Record the pages once with ``./crawl.sh --record``, then::
+
+    python -m benchmarks.parsers --save bench.json
+    python -m benchmarks.parsers --compare bench.json
+"""
+
+import argparse
+import sys
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+from parsel import Selector as ParselSelector
+from scrapy import Spider
+from scrapy.crawler import Crawler
+from scrapy.utils.project import get_project_settings
+
+from benchmarks.common import (
+    compare,
+    load_response,
+    measure,
+    peak_allocation,
+    print_table,
+    save_results,
+)
+from hk_climb_price.parser import Query
+from hk_climb_price.spiders.atticv import AtticVPriceSpider
+from hk_climb_price.spiders.justclimb import (
+    JustclimbDayPassParser,
+    JustclimbMembershipParser,
+    JustclimbMonthPassParser,
+    JustclimbPriceSpider,
+    JustclimbSharePassParser,
+)
+from hk_climb_price.spiders.vermcity import JustclimbPriceSpider as VermcitySpider
+
+# A case prepares its input from the response outside of the timed call
+Case = Tuple[Callable[[Any], Any], Callable[[Any], Any]]
+
+
+def _identity(response: Any) -> Any:
+    return response
+
+
+def _spider(spider_cls: Type[Spider]) -> Spider:
+    # Parsers count their time and packages in the stats of the crawler
+    return spider_cls.from_crawler(Crawler(spider_cls, get_project_settings()))
+
+
+def _cases() -> Dict[str, Dict[str, Case]]:
+    justclimb, vermcity, atticv = (
+        _spider(spider_cls)
+        for spider_cls in (JustclimbPriceSpider, VermcitySpider, AtticVPriceSpider)
+    )
+    cases: Dict[str, Dict[str, Case]] = {
+        JustclimbPriceSpider.name: {
+            parser_cls.__name__: (
+                _identity,
+                lambda response, cls=parser_cls: cls(selector=response).parse(),
+            )
+            for parser_cls in (
+                JustclimbDayPassParser,
+                JustclimbSharePassParser,
+                JustclimbMonthPassParser,
+                JustclimbMembershipParser,
+            )
+        },
+        VermcitySpider.name: {
+            "extract": (vermcity._select_main_content, VermcitySpider.PLAN.extract)
+        },
+        AtticVPriceSpider.name: {
+            "extract": (atticv._select_grid, AtticVPriceSpider.PLAN.extract)
+        },
+    }
+    for spider in (justclimb, vermcity, atticv):
+        cases[spider.name]["parse_gym"] = (
+            _identity,
+            lambda response, spider=spider: list(spider.parse_gym(response)),
+        )
+        if spider.extractors:
+            # No items when the page has no structured data and falls back
+            cases[spider.name]["parse_structured"] = (
+                _identity,
+                spider.parse_structured,
+            )
+    return cases
+
+
+class XPathCounter:
+    """
+    Count the xpath evaluations of parsel selectors (css queries included) and
+    of compiled queries
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    @contextmanager
+    def counting(self) -> Iterator["XPathCounter"]:
+        xpath = ParselSelector.xpath
+        evaluate = Query._results
+
+        def counted_xpath(selector: ParselSelector, *args: Any, **kwargs: Any) -> Any:
+            self.count += 1
+            return xpath(selector, *args, **kwargs)
+
+        def counted_evaluate(query: Query, *args: Any, **kwargs: Any) -> Any:
+            self.count += 1
+            return evaluate(query, *args, **kwargs)
+
+        ParselSelector.xpath = counted_xpath
+        Query._results = counted_evaluate
+        try:
+            yield self
+        finally:
+            ParselSelector.xpath = xpath
+            Query._results = evaluate
+
+
+def run_case(case: Case, response: Any, repeat: int) -> Dict[str, float]:
+    setup, run_parser = case
+    context = setup(response)
+
+    def run_once() -> Any:
+        return run_parser(context)
+
+    counter = XPathCounter()
+    with counter.counting():
+        items = len(run_once())
+    return {
+        **measure(run_once, repeat=repeat),
+        "items": items,
+        "xpath_evals": counter.count,
+        "peak_bytes": peak_allocation(run_once),
+    }
+
+
+def run(
+    gyms: Sequence[str], html: Dict[str, str], repeat: int
+) -> Dict[str, Dict[str, float]]:
+    spider_classes = {
+        spider_cls.name: spider_cls
+        for spider_cls in (JustclimbPriceSpider, VermcitySpider, AtticVPriceSpider)
+    }
+    results = {}
+    for gym, cases in _cases().items():
+        if gyms and gym not in gyms:
+            continue
+        response = load_response(spider_classes[gym], html.get(gym))
+        if response is None:
+            print(f"Skip {gym}: no archived page", file=sys.stderr)
+            continue
+        for name, case in cases.items():
+            results[f"{gym}/{name}"] = run_case(case, response, repeat)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("gyms", nargs="*", help="spider names, default to all")
+    parser.add_argument(
+        "--html",
+        action="append",
+        default=[],
+        metavar="GYM=PATH",
+        help="use a saved html page instead of the archive",
+    )
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    html = dict(item.split("=", 1) for item in args.html)
+    results = run(args.gyms, html, args.repeat)
+    print_table(results)
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Benchmark of the cross-gym price comparison over exported gym records
+
+Every record of ``docs/*.json`` is repeated ``--copies`` times, as thousands
+of packages would be::
+
+    python -m benchmarks.quotes --copies 100
+"""
+
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from benchmarks.common import (
+    compare,
+    load_records,
+    measure,
+    print_table,
+    save_results,
+)
+from hk_climb_price import compare as engine
+from hk_climb_price.compare import PriceTable
+from hk_climb_price.items import ClimbGym
+from hk_climb_price.normalize import normalize
+
+# Visits per month, months and audience of the benchmarked queries
+QUERIES = ((8, 6, "student"), (2, 1, "adult"), (12, 12, "adult"), (4, 3, "child"))
+
+
+@contextmanager
+def _arrays(name: str) -> Iterator[None]:
+    numpy = engine.numpy
+    if name == "python":
+        engine.numpy = None
+    try:
+        yield
+    finally:
+        engine.numpy = numpy
+
+
+def run(
+    gyms: Sequence[ClimbGym], copies: int, repeat: int
+) -> Dict[str, Dict[str, Any]]:
+    cases = ["python"]
+    if engine.numpy is not None:
+        cases.append("numpy")
+    results = {}
+    for name in cases:
+        with _arrays(name):
+            table = PriceTable(list(gyms) * copies)
+            timings = measure(
+                lambda: [table.quote(*query) for query in QUERIES], repeat=repeat
+            )
+            results[name] = {
+                # Per query
+                **{
+                    metric: round(value / len(QUERIES), 2)
+                    for metric, value in timings.items()
+                },
+                "packages": len(table),
+            }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "paths", nargs="*", help="exported jsonlines files, default to docs/*.json"
+    )
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    gyms = []
+    for record in load_records(args.paths):
+        data = json.loads(record)
+        data.setdefault("link", "")
+        gym = ClimbGym.from_dict(data)
+        gyms.append(replace(gym, packages=[normalize(p) for p in gym.packages]))
+    if not gyms:
+        print("No exported gym records", file=sys.stderr)
+        return 1
+    results = run(gyms, args.copies, args.repeat)
+    print_table(results)
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
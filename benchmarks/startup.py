@@ -0,0 +1,139 @@
+"""
+Import time of the spider loader at startup, checked against a budget
+
+Every case runs in a fresh interpreter with ``-X importtime``: loading the
+settings and the spider loader then listing the spiders, or loading one
+spider, as ``scrapy list`` and ``scrapy crawl <gym>`` do::
+
+    python -m benchmarks.startup --budget-ms 1500
+    python -m benchmarks.startup --save startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from scrapy.utils.project import get_project_settings
+
+from benchmarks.common import compare, print_table, save_results
+
+SCRAPY_LOADER = "scrapy.spiderloader.SpiderLoader"
+
+STARTUP = """\
+import json, sys, time
+start = time.perf_counter()
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.project import get_project_settings
+settings = get_project_settings()
+if sys.argv[1]:
+    settings.set("SPIDER_LOADER_CLASS", sys.argv[1])
+loader = CrawlerRunner._get_spider_loader(settings)
+loader.list()
+if sys.argv[2]:
+    loader.load(sys.argv[2])
+print(json.dumps({
+    "startup_us": (time.perf_counter() - start) * 1e6,
+    "spider_modules": sum(
+        name.startswith("hk_climb_price.spiders.") for name in sys.modules
+    ),
+}))
+"""
+
+
+def _imports(stderr: str) -> Tuple[int, Dict[str, int]]:
+    """
+    Cumulative import time in microseconds of the top level imports, and the
+    cumulative time of every module, from ``-X importtime``
+    """
+    total = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative)
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total, modules
+
+
+def run_case(
+    loader: str, spider: str, repeat: int
+) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """Median of the metrics of a startup over fresh interpreters
+
+    Returns:
+        Tuple[Dict[str, float], Dict[str, int]]: metrics, and the import time
+        of every module of the last run
+    """
+    runs: Dict[str, List[float]] = {}
+    modules: Dict[str, int] = {}
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP, loader, spider],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        import_us, modules = _imports(process.stderr)
+        metrics = {**json.loads(process.stdout), "import_us": import_us}
+        for metric, value in metrics.items():
+            runs.setdefault(metric, []).append(value)
+    return {
+        metric: round(statistics.median(values), 1) for metric, values in runs.items()
+    }, modules
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=1500,
+        help="startup time allowed to list the spiders or load one",
+    )
+    parser.add_argument("--top", type=int, default=10, help="slowest modules shown")
+    parser.add_argument("--save", metavar="PATH", help="save results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    spiders = list(get_project_settings().getdict("SPIDER_MANIFEST"))
+    cases = {"list": ("", ""), "list scrapy loader": (SCRAPY_LOADER, "")}
+    cases.update({f"load {spider}": ("", spider) for spider in spiders})
+    results = {}
+    failures = []
+    for name, (loader, spider) in cases.items():
+        results[name], modules = run_case(loader, spider, args.repeat)
+        if loader:
+            continue
+        if results[name]["spider_modules"] > bool(spider):
+            failures.append(f"{name} imports {results[name]['spider_modules']} spiders")
+        if results[name]["startup_us"] > args.budget_ms * 1000:
+            failures.append(
+                f"{name} takes {results[name]['startup_us'] / 1000:.0f} ms,"
+                f" over the budget of {args.budget_ms:.0f} ms"
+            )
+    print_table(results)
+    print("\nSlowest imports of the last case (cumulative us):")
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+    for module, cumulative in slowest[: args.top]:
+        print(f"{cumulative:>12}  {module}")
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    if args.save:
+        save_results(args.save, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        failures.extend(regressions)
+    return int(bool(failures))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+On-disk archive of raw responses, for offline and deterministic crawls
+"""
+
+import base64
+import gzip
+import json
+import os
+from typing import Iterator, Optional
+
+from scrapy import Request
+from scrapy.downloadermiddlewares.httpcompression import HttpCompressionMiddleware
+from scrapy.http import Headers, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.request import request_fingerprint
+
+
+class ResponseArchive:
+    """
+    Responses of one spider, each stored as a gzip compressed json file named
+    after the fingerprint of its request
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @classmethod
+    def from_spider(cls, archive_dir: str, spider_name: str) -> "ResponseArchive":
+        return cls(os.path.join(archive_dir, spider_name))
+
+    def _path(self, request: Request) -> str:
+        return os.path.join(self.directory, f"{request_fingerprint(request)}.json.gz")
+
+    def store(self, request: Request, response: Response) -> None:
+        record = {
+            "request": {"url": request.url, "method": request.method},
+            "url": response.url,
+            "status": response.status,
+            "headers": {
+                key.decode("latin-1"): [value.decode("latin-1") for value in values]
+                for key, values in response.headers.items()
+            },
+            "body": base64.b64encode(response.body).decode("ascii"),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        with gzip.open(self._path(request), "wt", encoding="utf-8") as file:
+            json.dump(record, file)
+
+    def _load(self, path: str) -> Response:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            record = json.load(file)
+        headers = Headers(record["headers"])
+        body = base64.b64decode(record["body"])
+        respcls = responsetypes.from_args(headers=headers, url=record["url"], body=body)
+        return respcls(
+            url=record["url"],
+            status=record["status"],
+            headers=headers,
+            body=body,
+            request=Request(**record["request"]),
+        )
+
+    def retrieve(self, request: Request) -> Optional[Response]:
+        """
+        Archived response of the request, or None if it was never recorded
+        """
+        path = self._path(request)
+        if not os.path.exists(path):
+            return None
+        return self._load(path)
+
+    def __iter__(self) -> Iterator[Response]:
+        """
+        Iterate over every archived response, with content encoding decoded
+        """
+        if not os.path.isdir(self.directory):
+            return
+        decoder = HttpCompressionMiddleware()
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json.gz"):
+                response = self._load(os.path.join(self.directory, name))
+                yield decoder.process_response(response.request, response, None)
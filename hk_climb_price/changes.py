@@ -0,0 +1,103 @@
+"""
+Changes of the packages of a gym between two snapshots
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from hk_climb_price.exporters import dumps
+from hk_climb_price.items import PackageItem
+
+# Fields of a package which may change while its identity stays the same
+COMPARED_FIELDS = ("currency_symbol", "price", "validity", "tags")
+
+# Category, title and occurrence, for gyms listing the same package twice
+PackageKey = Tuple[str, str, int]
+
+
+def _keyed(packages: Iterable[Dict[str, Any]]) -> Dict[PackageKey, Dict[str, Any]]:
+    keyed = {}
+    occurrences: Dict[Tuple[str, str], int] = {}
+    for package in packages:
+        identity = (package["category"], package["title"])
+        occurrence = occurrences.get(identity, 0)
+        occurrences[identity] = occurrence + 1
+        keyed[(*identity, occurrence)] = package
+    return keyed
+
+
+def load_snapshot(path: str) -> Dict[PackageKey, Dict[str, Any]]:
+    """
+    Packages of an exported gym file keyed by identity, empty if there is none
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        packages = [
+            package
+            for line in file
+            if line.strip()
+            for package in json.loads(line)["packages"]
+        ]
+    return _keyed(packages)
+
+
+def diff(
+    previous: Dict[PackageKey, Dict[str, Any]], packages: Iterable[PackageItem]
+) -> Iterator[Dict[str, Any]]:
+    """Compare packages with the previous snapshot in one pass
+
+    Yields:
+        Dict[str, Any]: a change record, ``added``, ``removed`` or ``changed``
+        with the before / after value of every changed field
+    """
+    remaining = dict(previous)
+    for key, package in _keyed(package.to_dict() for package in packages).items():
+        category, title, _ = key
+        before = remaining.pop(key, None)
+        if before is None:
+            yield {
+                "change": "added",
+                "category": category,
+                "title": title,
+                "package": package,
+            }
+            continue
+        fields = {
+            name: {"before": before.get(name), "after": package[name]}
+            for name in COMPARED_FIELDS
+            if before.get(name) != package[name]
+        }
+        if fields:
+            yield {
+                "change": "changed",
+                "category": category,
+                "title": title,
+                "fields": fields,
+            }
+    for (category, title, _), package in remaining.items():
+        yield {
+            "change": "removed",
+            "category": category,
+            "title": title,
+            "package": package,
+        }
+
+
+def changes_path(docs_dir: str, gym: str) -> str:
+    return os.path.join(docs_dir, f"{gym}-changes.jsonl")
+
+
+def snapshot_path(docs_dir: str, gym: str) -> str:
+    return os.path.join(docs_dir, f"{gym}.json")
+
+
+def append_changes(path: str, records: List[Dict[str, Any]]) -> None:
+    """
+    Append change records to a json lines file, one record per line
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "ab") as file:
+        for record in records:
+            file.write(dumps(record) + b"\n")
@@ -0,0 +1,228 @@
+"""
+Rank the packages of every gym by their cost for a pattern of visits
+"""
+
+import argparse
+import glob
+import heapq
+import json
+import math
+import os
+import sys
+from dataclasses import replace
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from scrapy.utils.project import get_project_settings
+
+from hk_climb_price.items import ClimbGym, PackageItem
+from hk_climb_price.normalize import DAYS_PER_MONTH, UNLIMITED_CATEGORIES, normalize
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Packages which let a climber in, unlike classes or equipment rental
+VISIT_CATEGORIES = frozenset(
+    ("day-pass", "section-pass", "multi-pass", "share-pass", "month-pass", "membership")
+)
+
+# Packages of an audience are quoted for this audience and the ones after it
+AUDIENCES = ("adult", "student", "child")
+AUDIENCE_RANKS = {None: 0, **{name: rank for rank, name in enumerate(AUDIENCES)}}
+
+
+class Quote(NamedTuple):
+    """
+    Cost of a package for a pattern of visits, ``passes`` is the number of
+    passes bought, or of months paid for monthly memberships
+    """
+
+    gym: str
+    title: str
+    category: str
+    passes: int
+    cost: float
+    cost_per_visit: float
+
+
+class PriceTable:
+    """
+    Packages of every gym as columns, to quote all of them at once
+
+    Packages which are not a way in (classes, rentals) or whose number of
+    visits or duration is unknown are left out. Columns are numpy arrays when
+    numpy is installed, lists otherwise.
+    """
+
+    def __init__(self, gyms: Iterable[ClimbGym]):
+        self.rows: List[Tuple[str, PackageItem]] = []
+        columns: Tuple[List, ...] = ([], [], [], [], [])
+        for gym in gyms:
+            for package in gym.packages:
+                row = self._columns(package)
+                if row is not None:
+                    self.rows.append((gym.name, package))
+                    for column, value in zip(columns, row):
+                        column.append(value)
+        if numpy is not None:
+            columns = (
+                numpy.array(columns[0], dtype=float),
+                numpy.array(columns[1], dtype=float),
+                numpy.array(columns[2], dtype=float),
+                numpy.array(columns[3], dtype=bool),
+                numpy.array(columns[4], dtype=int),
+            )
+        self.price, self.visits, self.days, self.per_month, self.audience = columns
+
+    @staticmethod
+    def _columns(
+        package: PackageItem,
+    ) -> Optional[Tuple[float, float, float, bool, int]]:
+        if package.category not in VISIT_CATEGORIES or not package.price:
+            return None
+        unlimited = package.category in UNLIMITED_CATEGORIES
+        if package.visits is None and not unlimited:
+            return None
+        if package.duration_days is None and unlimited:
+            return None
+        return (
+            package.price,
+            math.inf if unlimited else package.visits,
+            package.duration_days or math.inf,
+            package.per_month,
+            AUDIENCE_RANKS.get(package.audience, 0),
+        )
+
+    @classmethod
+    def load(cls, paths: Sequence[str]) -> "PriceTable":
+        """
+        Table of exported gym files
+        """
+        gyms = []
+        for path in paths:
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        gym = ClimbGym.from_dict({"link": "", **json.loads(line)})
+                        # Files exported before packages were normalized
+                        gyms.append(
+                            replace(gym, packages=[normalize(p) for p in gym.packages])
+                        )
+        return cls(gyms)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _costs_numpy(self, visits_per_month: float, months: float, rank: int):
+        visits = visits_per_month * months
+        # Visits made within the validity of a pass, at least one
+        usable = numpy.minimum(
+            self.visits,
+            numpy.maximum(
+                1, numpy.floor(visits_per_month * self.days / DAYS_PER_MONTH)
+            ),
+        )
+        passes = numpy.ceil(visits / usable)
+        billed = numpy.ceil(
+            numpy.maximum(months * DAYS_PER_MONTH, self.days) / DAYS_PER_MONTH
+        )
+        passes = numpy.where(self.per_month, billed, passes)
+        costs = numpy.where(self.audience <= rank, self.price * passes, numpy.inf)
+        return passes, costs
+
+    def _costs_python(self, visits_per_month: float, months: float, rank: int):
+        visits = visits_per_month * months
+        passes, costs = [], []
+        for price, total, days, per_month, audience in zip(
+            self.price, self.visits, self.days, self.per_month, self.audience
+        ):
+            if per_month:
+                count = math.ceil(max(months * DAYS_PER_MONTH, days) / DAYS_PER_MONTH)
+            elif days == math.inf:
+                count = math.ceil(visits / total)
+            else:
+                usable = min(
+                    total,
+                    max(1, math.floor(visits_per_month * days / DAYS_PER_MONTH)),
+                )
+                count = math.ceil(visits / usable)
+            passes.append(count)
+            costs.append(price * count if audience <= rank else math.inf)
+        return passes, costs
+
+    def quote(
+        self,
+        visits_per_month: float,
+        months: float,
+        audience: str = "adult",
+        top: Optional[int] = 10,
+    ) -> List[Quote]:
+        """Cost of every package for a number of visits per month over months
+
+        Student packages are only quoted for students and children, child
+        packages for children. Enough passes are bought to cover every visit,
+        each pass used within its duration.
+
+        Returns:
+            List[Quote]: the top cheapest first, every package if top is None
+        """
+        if not self.rows or visits_per_month <= 0 or months <= 0:
+            return []
+        visits = visits_per_month * months
+        rank = AUDIENCE_RANKS[audience]
+        if numpy is not None:
+            passes, costs = self._costs_numpy(visits_per_month, months, rank)
+            order = numpy.flatnonzero(numpy.isfinite(costs))
+            if top is not None and top < len(order):
+                # Keep every package tied with the last one, ties rank by index
+                last = numpy.partition(costs[order], top - 1)[top - 1]
+                order = order[costs[order] <= last]
+            order = order[numpy.argsort(costs[order], kind="stable")][:top].tolist()
+        else:
+            passes, costs = self._costs_python(visits_per_month, months, rank)
+            order = (index for index, cost in enumerate(costs) if cost != math.inf)
+            if top is None:
+                order = sorted(order, key=costs.__getitem__)
+            else:
+                order = heapq.nsmallest(top, order, key=costs.__getitem__)
+        return [
+            Quote(
+                gym=self.rows[index][0],
+                title=self.rows[index][1].title,
+                category=self.rows[index][1].category,
+                passes=int(passes[index]),
+                cost=float(costs[index]),
+                cost_per_visit=round(float(costs[index]) / visits, 2),
+            )
+            for index in order
+        ]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("visits", type=float, help="visits per month")
+    parser.add_argument("months", type=float, help="number of months")
+    parser.add_argument("--audience", choices=AUDIENCES, default="adult")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "paths", nargs="*", help="exported gym files, default to <DOCS_DIR>/*.json"
+    )
+    args = parser.parse_intermixed_args(argv)
+
+    docs_dir = get_project_settings().get("DOCS_DIR")
+    table = PriceTable.load(
+        args.paths or sorted(glob.glob(os.path.join(docs_dir, "*.json")))
+    )
+    for rank, quote in enumerate(
+        table.quote(args.visits, args.months, args.audience, args.top), 1
+    ):
+        print(
+            f"{rank}\t{quote.gym}\t{quote.title}\t{quote.category}\t"
+            f"{quote.passes}\t{quote.cost:.0f}\t{quote.cost_per_visit:.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
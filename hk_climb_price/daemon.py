@@ -0,0 +1,203 @@
+"""
+Resident crawl daemon revisiting every gym as often as its prices change
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Set
+from urllib.parse import urlparse
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+from scrapy.utils.project import get_project_settings
+from twisted.internet import reactor
+from twisted.python.failure import Failure
+
+from hk_climb_price.changes import changes_path
+from hk_climb_price.history import TIME_FORMAT
+from hk_climb_price.runner import GymCrawl
+
+logger = logging.getLogger(__name__)
+
+
+def change_times(path: str) -> List[float]:
+    """
+    Times of the runs which changed the packages of a gym, oldest first, from
+    its change records
+    """
+    if not os.path.exists(path):
+        return []
+    run_ats = set()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                run_ats.add(json.loads(line)["run_at"])
+    return sorted(
+        datetime.strptime(run_at, TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+        for run_at in run_ats
+    )
+
+
+class RevisitSchedule:
+    """
+    Revisit interval of a gym, learned from the times its packages changed
+
+    Changes are taken as a Poisson process. Its rate is the changes seen since
+    the first observation, with a prior of one change per ``max_interval``,
+    and the gym is revisited after ``factor`` times the mean time between
+    changes, within ``min_interval`` and ``max_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        since: float,
+        changes: int,
+        min_interval: float,
+        max_interval: float,
+        factor: float,
+    ):
+        self.since = since
+        self.changes = changes
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, times: Sequence[float], now: float
+    ) -> "RevisitSchedule":
+        """
+        Schedule of a gym whose packages changed at the given times, the
+        first of them starting the observation
+        """
+        return cls(
+            times[0] if times else now,
+            max(len(times) - 1, 0),
+            settings.getfloat("DAEMON_MIN_INTERVAL"),
+            settings.getfloat("DAEMON_MAX_INTERVAL"),
+            settings.getfloat("DAEMON_REVISIT_FACTOR"),
+        )
+
+    def observe(self, changed: bool) -> None:
+        if changed:
+            self.changes += 1
+
+    def interval(self, now: float) -> float:
+        rate = (1 + self.changes) / (self.max_interval + now - self.since)
+        return min(max(self.factor / rate, self.min_interval), self.max_interval)
+
+
+class CrawlDaemon:
+    """
+    Crawl every gym on its own schedule in one resident Scrapy process
+
+    The reactor, the spiders and the fingerprints stay loaded between checks.
+    A check is a ``GymCrawl`` exporting to ``output_dir``: an unchanged gym
+    costs the revalidation of its page and no parse. Failed checks are retried
+    after ``DAEMON_RETRY_INTERVAL`` seconds. Gyms of the same domain are never
+    crawled together, nor within ``DAEMON_DOMAIN_DELAY`` seconds of each other.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        gyms: Optional[Sequence[str]] = None,
+        output_dir: str = "docs",
+    ):
+        self.process = CrawlerProcess(settings)
+        self.output_dir = output_dir
+        self.domain_delay = settings.getfloat("DAEMON_DOMAIN_DELAY")
+        self.retry_interval = settings.getfloat("DAEMON_RETRY_INTERVAL")
+        loader = self.process.spider_loader
+        now = time.time()
+        self.schedules: Dict[str, RevisitSchedule] = {
+            name: RevisitSchedule.from_settings(
+                settings, change_times(changes_path(output_dir, name)), now
+            )
+            for name in gyms or loader.list()
+        }
+        self.domains = {
+            name: urlparse(loader.load(name).start_urls[0]).netloc
+            for name in self.schedules
+        }
+        self.crawling: Set[str] = set()
+        self.domain_free_at: Dict[str, float] = {}
+
+    def schedule(self, name: str, delay: float) -> None:
+        logger.info(f"Next check of {name} in {timedelta(seconds=round(delay))}")
+        reactor.callLater(delay, self.check, name)
+
+    def check(self, name: str) -> None:
+        domain = self.domains[name]
+        if domain in self.crawling:
+            reactor.callLater(self.domain_delay, self.check, name)
+            return
+        wait = self.domain_free_at.get(domain, 0) - time.time()
+        if wait > 0:
+            reactor.callLater(wait, self.check, name)
+            return
+        self.crawling.add(domain)
+        gym_crawl = GymCrawl(self.process, name, self.output_dir)
+        deferred = self.process.crawl(gym_crawl.crawler)
+        deferred.addBoth(self._checked, name, gym_crawl)
+
+    def _checked(self, result, name: str, gym_crawl: GymCrawl) -> None:
+        domain = self.domains[name]
+        self.crawling.discard(domain)
+        self.domain_free_at[domain] = time.time() + self.domain_delay
+        if isinstance(result, Failure):
+            logger.error(f"Fail to crawl {name}: {result.getErrorMessage()}")
+            self.schedule(name, self.retry_interval)
+            return
+        try:
+            message = gym_crawl.report()
+        except OSError:
+            logger.exception(f"Fail to publish {name}")
+            self.schedule(name, self.retry_interval)
+            return
+        logger.info(f"{name}: {message} ({gym_crawl.fetch_status or 'no fetch'})")
+        if gym_crawl.failed:
+            self.schedule(name, self.retry_interval)
+            return
+        schedule = self.schedules[name]
+        schedule.observe(gym_crawl.changed)
+        self.schedule(name, schedule.interval(time.time()))
+
+    def start(self) -> None:
+        """
+        Check every gym now, then on its schedule, until interrupted
+        """
+        for name in self.schedules:
+            reactor.callLater(0, self.check, name)
+        self.process.start(stop_after_crawl=False)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("gyms", nargs="*", help="spider names, default to all")
+    parser.add_argument("-o", "--output-dir", default="docs")
+    parser.add_argument(
+        "--intervals",
+        action="store_true",
+        help="print the revisit interval learned for every gym and exit",
+    )
+    args = parser.parse_args(argv)
+
+    daemon = CrawlDaemon(get_project_settings(), args.gyms, args.output_dir)
+    if args.intervals:
+        now = time.time()
+        for name, schedule in daemon.schedules.items():
+            interval = timedelta(seconds=round(schedule.interval(now)))
+            print(f"{name}: {schedule.changes} changes, every {interval}")
+        return 0
+    daemon.start()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
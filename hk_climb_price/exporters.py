@@ -0,0 +1,66 @@
+"""
+Feed exporters of the gym records
+"""
+
+import json
+from typing import Any, Dict
+
+from itemadapter import ItemAdapter
+from scrapy.exporters import BaseItemExporter
+
+from hk_climb_price.items import ClimbGym
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _package_key(package: Dict[str, Any]) -> tuple:
+    return (
+        package["category"] or "",
+        package["title"] or "",
+        package["currency_symbol"] or "",
+        package["price"] or 0,
+        package["validity"] or "",
+        package["tags"],
+    )
+
+
+def canonical(item: Any) -> Dict[str, Any]:
+    """Dict form of an item with a fixed key order
+
+    Packages of a gym record are sorted. Tags keep the page order, items sort
+    tags given as a set. Other items have their keys sorted.
+    """
+    if isinstance(item, ClimbGym):
+        data = item.to_dict()
+        data["packages"].sort(key=_package_key)
+        return data
+    data = ItemAdapter(item).asdict()
+    return {key: data[key] for key in sorted(data)}
+
+
+def dumps(data: Dict[str, Any]) -> bytes:
+    """
+    Compact UTF-8 json, the same bytes with or without orjson
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ClimbGymJsonLinesExporter(BaseItemExporter):
+    """
+    Json lines exporter which writes the same bytes for the same gym records,
+    so that exported files can be compared byte for byte
+
+    Any encoding or field options are ignored, the output is always canonical.
+    """
+
+    def __init__(self, file, **kwargs):
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+
+    def export_item(self, item):
+        self.file.write(dumps(canonical(item)) + b"\n")
@@ -0,0 +1,244 @@
+"""
+Crawl instrumentation, exported as a Prometheus textfile and a json run report,
+and opt-in profiling of the parsers
+"""
+
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+
+from hk_climb_price import profiling
+from hk_climb_price.helpers import dump_json, dump_text
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "hk_climb_price"
+
+# Name, type, help and samples as (suffix, labels, value)
+Metric = Tuple[str, str, str, Sequence[Tuple[str, Dict[str, Any], float]]]
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(metrics: Sequence[Metric]) -> str:
+    """
+    Metrics in the Prometheus text exposition format
+    """
+    lines = []
+    for name, metric_type, description, samples in metrics:
+        lines.append(f"# HELP {PREFIX}_{name} {description}")
+        lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+        for suffix, labels, value in samples:
+            text = ",".join(f'{key}="{_label(label)}"' for key, label in labels.items())
+            lines.append(f"{PREFIX}_{name}{suffix}{{{text}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class CrawlStatsExtension:
+    """
+    Record where the run of a gym spent its time, and export it once the
+    spider closes to ``<STATS_EXPORT_DIR>/<gym>.prom`` for the node exporter
+    textfile collector and ``<STATS_EXPORT_DIR>/<gym>.json``
+
+    Download latency and size come from the responses, parse time, packages
+    and failures of every parser from the ``parser/<name>/...`` stats of
+    ``BaseGymSpider.parse_packages()``.
+    """
+
+    def __init__(self, crawler, directory: str):
+        self.crawler = crawler
+        self.directory = directory
+        self.downloads: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("STATS_EXPORT_ENABLED"):
+            raise NotConfigured
+        extension = cls(crawler, data_path(crawler.settings.get("STATS_EXPORT_DIR")))
+        crawler.signals.connect(
+            extension.response_received, signal=signals.response_received
+        )
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get("download_latency", 0.0)
+        self.downloads.append(
+            {
+                "url": response.url,
+                "status": response.status,
+                "latency_seconds": round(latency, 6),
+                "bytes": len(response.body),
+            }
+        )
+
+    def _parsers(self) -> Dict[str, Dict[str, float]]:
+        parsers: Dict[str, Dict[str, float]] = {}
+        for key, value in self.crawler.stats.get_stats().items():
+            if key.startswith("parser/"):
+                name, _, metric = key[len("parser/") :].rpartition("/")
+                parsers.setdefault(name, {"seconds": 0, "items": 0, "errors": 0})
+                parsers[name][metric] = value
+        return parsers
+
+    def report(self, spider, reason: str) -> Dict[str, Any]:
+        stats = self.crawler.stats
+        start_time = stats.get_value("start_time")
+        if start_time.tzinfo is None:
+            # Scrapy records naive UTC times
+            start_time = start_time.replace(tzinfo=timezone.utc)
+        now = datetime.now(timezone.utc)
+        return {
+            "gym": spider.name,
+            "name": getattr(spider, "gym_name", spider.name),
+            "reason": reason,
+            "start_time": start_time.isoformat(),
+            "duration_seconds": round((now - start_time).total_seconds(), 6),
+            "downloads": self.downloads,
+            "parsers": self._parsers(),
+            "packages": stats.get_value("gym/packages", 0),
+            "parser_errors": stats.get_value("gym/parser_errors", 0),
+            "partial": bool(stats.get_value("gym/partial")),
+        }
+
+    def metrics(self, report: Dict[str, Any]) -> List[Metric]:
+        gym = {"gym": report["gym"]}
+        downloads = report["downloads"]
+        parsers = sorted(report["parsers"].items())
+        return [
+            (
+                "download_latency_seconds",
+                "summary",
+                "Download latency of the pages of the gym",
+                [
+                    (
+                        "_sum",
+                        gym,
+                        sum(download["latency_seconds"] for download in downloads),
+                    ),
+                    ("_count", gym, len(downloads)),
+                ],
+            ),
+            (
+                "response_bytes",
+                "gauge",
+                "Size of the responses of the gym",
+                [("", gym, sum(download["bytes"] for download in downloads))],
+            ),
+            (
+                "parse_seconds",
+                "gauge",
+                "Time spent in every parser",
+                [
+                    ("", {**gym, "parser": name}, value["seconds"])
+                    for name, value in parsers
+                ],
+            ),
+            (
+                "parser_items",
+                "gauge",
+                "Packages returned by every parser",
+                [
+                    ("", {**gym, "parser": name}, value["items"])
+                    for name, value in parsers
+                ],
+            ),
+            (
+                "parser_errors",
+                "gauge",
+                "Failures of every parser",
+                [
+                    ("", {**gym, "parser": name}, value["errors"])
+                    for name, value in parsers
+                ],
+            ),
+            (
+                "packages",
+                "gauge",
+                "Packages exported for the gym",
+                [("", gym, report["packages"])],
+            ),
+            (
+                "run_duration_seconds",
+                "gauge",
+                "Duration of the last run",
+                [("", gym, report["duration_seconds"])],
+            ),
+            (
+                "run_success",
+                "gauge",
+                "Whether the last run finished with every parser successful",
+                [
+                    (
+                        "",
+                        gym,
+                        int(report["reason"] == "finished" and not report["partial"]),
+                    )
+                ],
+            ),
+            (
+                "last_run_timestamp_seconds",
+                "gauge",
+                "Start time of the last run",
+                [("", gym, datetime.fromisoformat(report["start_time"]).timestamp())],
+            ),
+        ]
+
+    def spider_closed(self, spider, reason):
+        report = self.report(spider, reason)
+        path = os.path.join(self.directory, spider.name)
+        dump_json(f"{path}.json", report, indent=2)
+        dump_text(f"{path}.prom", prometheus_text(self.metrics(report)))
+
+
+class ProfilingExtension:
+    """
+    Profile ``parse()`` of the spider and ``parse()`` of every
+    ``BasePassParser`` with cProfile and tracemalloc, and write to
+    ``<DOCS_DIR>/<PROFILE_DIR>`` once the spider closes:
+
+    - ``<gym>.prof``, cProfile statistics for ``pstats``, snakeviz or flameprof
+    - ``<gym>.alloc.folded``, allocations as collapsed stacks for flamegraph.pl
+    - ``<gym>.alloc.txt``, peak memory, memory held by every parser and the
+      top ``PROFILE_TOP_ALLOCATIONS`` allocation lines
+
+    Nothing is wrapped unless ``PROFILE_ENABLED`` is set.
+    """
+
+    def __init__(self, directory: str, frames: int, top: int):
+        self.directory = directory
+        self.frames = frames
+        self.top = top
+        self.profile = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("PROFILE_ENABLED"):
+            raise NotConfigured
+        extension = cls(
+            os.path.join(settings.get("DOCS_DIR"), settings.get("PROFILE_DIR")),
+            settings.getint("PROFILE_TRACEMALLOC_FRAMES"),
+            settings.getint("PROFILE_TOP_ALLOCATIONS"),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        profiling.install_parser_hooks()
+        self.profile = profiling.SpiderProfile(spider.name, self.frames)
+        if not self.profile.traced:
+            logger.warning("tracemalloc is already tracing, memory is not profiled")
+        spider.parse = self.profile.wrap(spider.parse)
+
+    def spider_closed(self, spider):
+        for path in self.profile.dump(self.directory, self.top):
+            logger.info(f"Profile of {spider.name} written to {path}")
@@ -0,0 +1,117 @@
+"""
+Content fingerprint of the page regions read by the parsers
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from lxml import etree
+from scrapy import Selector
+from twisted.internet import reactor
+from twisted.python.threadable import isInIOThread
+
+from hk_climb_price.helpers import dump_json, load_json
+from hk_climb_price.items import ClimbGym, PackageItem
+
+# Elements whose content never reaches a parser but changes on every request
+NOISE_TAGS = {"script", "style", "noscript", "iframe", "svg"}
+# The only attributes parsers select on
+KEPT_ATTRIBUTES = ("id", "class")
+
+ITEM_CLASSES = {cls.__name__: cls for cls in (ClimbGym, PackageItem)}
+
+
+def _update(digest: Any, element: etree._Element) -> None:
+    if not isinstance(element.tag, str) or element.tag in NOISE_TAGS:
+        return
+    digest.update(f"<{element.tag}".encode())
+    for name in KEPT_ATTRIBUTES:
+        digest.update(f" {name}={element.get(name, '')}".encode())
+    digest.update(f">{element.text or ''}".encode())
+    for child in element:
+        _update(digest, child)
+        digest.update(f"{child.tail or ''}".encode())
+    digest.update(f"</{element.tag}>".encode())
+
+
+def fingerprint(selectors: Iterable[Selector]) -> Optional[str]:
+    """Hash the tags, ids, classes and text of the selected subtrees
+
+    Scripts, styles, comments and any other attribute are left out, so nonces,
+    timestamps and tracking code do not change the fingerprint.
+
+    Returns:
+        Optional[str]: the fingerprint, or None if nothing is selected
+    """
+    digest = hashlib.sha1()
+    selected = False
+    for selector in selectors:
+        if isinstance(selector.root, etree._Element):
+            _update(digest, selector.root)
+            selected = True
+    return digest.hexdigest() if selected else None
+
+
+class FingerprintStore:
+    """
+    Fingerprint and scraped items of the last run, per url, for one spider
+    """
+
+    # Stores by path, read once per process and kept across the runs of a
+    # resident daemon
+    _loaded: Dict[str, "FingerprintStore"] = {}
+
+    def __init__(self, path: str, persist: bool = True):
+        self.path = path
+        self.persist = persist
+        self.entries: Dict[str, Dict[str, Any]] = (
+            load_json(path, default={}) if persist else {}
+        )
+
+    @classmethod
+    def from_spider(cls, store_dir: str, spider_name: str) -> "FingerprintStore":
+        path = os.path.join(store_dir, f"{spider_name}.json")
+        if path not in cls._loaded:
+            cls._loaded[path] = cls(path)
+        return cls._loaded[path]
+
+    @classmethod
+    def in_memory(
+        cls, store_dir: str, spider_name: str, entries: Dict[str, Dict[str, Any]]
+    ) -> "FingerprintStore":
+        """
+        Store of a spider holding the given entries, never written to disk, as
+        the worker processes of ``hk_climb_price.offload`` parse with
+        """
+        store = cls(os.path.join(store_dir, f"{spider_name}.json"), persist=False)
+        store.entries = entries
+        cls._loaded[store.path] = store
+        return store
+
+    def get(self, url: str, digest: str) -> Optional[List[Any]]:
+        """
+        Items scraped from url the last time it had the given fingerprint
+        """
+        entry = self.entries.get(url)
+        if not entry or entry["fingerprint"] != digest:
+            return None
+        return [
+            ITEM_CLASSES[item["type"]].from_dict(item["data"])
+            for item in entry["items"]
+        ]
+
+    def set(self, url: str, digest: str, items: Iterable[Any]) -> None:
+        if self.persist and reactor.running and not isInIOThread():
+            # Parse threads of PARSE_POOL hand their entries over to the
+            # reactor thread, the only one to update and write the store
+            reactor.callFromThread(self.set, url, digest, list(items))
+            return
+        self.entries[url] = {
+            "fingerprint": digest,
+            "items": [
+                {"type": type(item).__name__, "data": item.to_dict()} for item in items
+            ],
+        }
+        if self.persist:
+            dump_json(self.path, self.entries)
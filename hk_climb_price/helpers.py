@@ -1,6 +1,8 @@
 """Helper functions"""
 
-from typing import Dict, Union
+import json
+import os
+from typing import Any, Dict, Union
 
 
 def breakdown_price_tag(price_tag: str) -> Dict[str, Union[str, int]]:
@@ -17,3 +19,35 @@ def breakdown_price_tag(price_tag: str) -> Dict[str, Union[str, int]]:
 
 def process_text(string: str) -> str:
     return string.strip().replace("\xa0", "").strip("; -:")
+
+
+def load_json(path: str, default: Any = None) -> Any:
+    """
+    Load a json file, or return the default if the file does not exist
+    """
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def dump_json(path: str, data: Any, **kwargs: Any) -> None:
+    """
+    Atomically write data as a json file
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, sort_keys=True, **kwargs)
+    os.replace(temp_path, path)
+
+
+def dump_text(path: str, text: str) -> None:
+    """
+    Atomically write a text file
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temp_path, path)
@@ -0,0 +1,281 @@
+"""
+Price history of every gym, queried from a local SQLite database
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from scrapy.utils.project import data_path, get_project_settings
+
+from hk_climb_price.items import PackageItem
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    gym TEXT NOT NULL,
+    name TEXT NOT NULL,
+    run_at TEXT NOT NULL,
+    partial INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_gym_run_at ON runs (gym, run_at);
+
+CREATE TABLE IF NOT EXISTS packages (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    gym TEXT NOT NULL,
+    category TEXT NOT NULL,
+    title TEXT NOT NULL,
+    run_at TEXT NOT NULL,
+    currency_symbol TEXT,
+    price INTEGER,
+    validity TEXT,
+    tags TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS packages_identity
+    ON packages (gym, category, title, run_at);
+CREATE INDEX IF NOT EXISTS packages_run ON packages (run_id);
+"""
+
+# Price of a package at a run: run_at, category, title, currency, price, validity
+PriceRow = Tuple[str, str, str, Optional[str], Optional[int], Optional[str]]
+
+
+def format_time(when: datetime) -> str:
+    """
+    Time as stored in the history, in UTC
+    """
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+    return when.strftime(TIME_FORMAT)
+
+
+def parse_time(text: str) -> str:
+    """
+    Stored form of a date or time given on the command line, in UTC
+    """
+    return format_time(datetime.fromisoformat(text.replace("Z", "+00:00")))
+
+
+class HistoryStore:
+    """
+    Packages scraped by every run of every gym
+
+    A run is written in one transaction. Packages are indexed by gym,
+    category, title and run time for range queries, and by run for point in
+    time queries.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def add_run(
+        self,
+        gym: str,
+        name: str,
+        run_at: str,
+        packages: Iterable[PackageItem],
+        partial: bool = False,
+    ) -> int:
+        """Append the packages of a run
+
+        Returns:
+            int: id of the run
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (gym, name, run_at, partial) VALUES (?, ?, ?, ?)",
+                (gym, name, run_at, int(partial)),
+            )
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO packages (run_id, gym, category, title, run_at,"
+                " currency_symbol, price, validity, tags)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        run_id,
+                        gym,
+                        package.category,
+                        package.title,
+                        run_at,
+                        package.currency_symbol,
+                        package.price,
+                        package.validity,
+                        json.dumps(list(package.tags), ensure_ascii=False),
+                    )
+                    for package in packages
+                ),
+            )
+        return run_id
+
+    def runs(self, gym: Optional[str] = None) -> List[Tuple[str, str, str, int]]:
+        """
+        Runs as (gym, name, run_at, partial), oldest first
+        """
+        query = "SELECT gym, name, run_at, partial FROM runs"
+        if gym is None:
+            return self.connection.execute(f"{query} ORDER BY run_at").fetchall()
+        return self.connection.execute(
+            f"{query} WHERE gym = ? ORDER BY run_at", (gym,)
+        ).fetchall()
+
+    def at(self, gym: str, when: str) -> List[PackageItem]:
+        """
+        Packages of the last run of the gym at or before the given time
+        """
+        row = self.connection.execute(
+            "SELECT id FROM runs WHERE gym = ? AND run_at <= ?"
+            " ORDER BY run_at DESC LIMIT 1",
+            (gym, when),
+        ).fetchone()
+        if row is None:
+            return []
+        return [
+            PackageItem(
+                title=title,
+                category=category,
+                tags=json.loads(tags),
+                currency_symbol=currency_symbol,
+                price=price,
+                validity=validity,
+            )
+            for title, category, tags, currency_symbol, price, validity in (
+                self.connection.execute(
+                    "SELECT title, category, tags, currency_symbol, price, validity"
+                    " FROM packages WHERE run_id = ?",
+                    (row[0],),
+                )
+            )
+        ]
+
+    def prices(
+        self,
+        gym: str,
+        category: Optional[str] = None,
+        title: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Iterator[PriceRow]:
+        """
+        Prices of the packages of a gym over a time range, oldest first
+        """
+        conditions = ["gym = ?"]
+        params: List[str] = [gym]
+        for column, value in (("category", category), ("title", title)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("run_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("run_at <= ?")
+            params.append(until)
+        return self.connection.execute(
+            "SELECT run_at, category, title, currency_symbol, price, validity"
+            f" FROM packages WHERE {' AND '.join(conditions)}"
+            " ORDER BY category, title, run_at",
+            params,
+        )
+
+
+def changes(rows: Iterable[PriceRow]) -> Iterator[PriceRow]:
+    """
+    Rows whose price or validity differ from the previous row of the package
+    """
+    last = {}
+    for row in rows:
+        identity, value = row[1:3], row[3:]
+        if last.get(identity) != value:
+            last[identity] = value
+            yield row
+
+
+def _print_rows(rows: Iterable[Sequence]) -> None:
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "--db", default=data_path(get_project_settings().get("HISTORY_DB"))
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prices = commands.add_parser("prices", help="prices over a time range")
+    prices.add_argument("gym", help="spider name")
+    prices.add_argument("--category")
+    prices.add_argument("--title")
+    prices.add_argument("--since", type=parse_time)
+    prices.add_argument("--until", type=parse_time)
+    prices.add_argument(
+        "--all", action="store_true", help="every run, not only price changes"
+    )
+
+    at = commands.add_parser("at", help="packages at a point in time")
+    at.add_argument("gym", help="spider name")
+    at.add_argument("when", type=parse_time)
+
+    runs = commands.add_parser("runs", help="recorded runs")
+    runs.add_argument("gym", nargs="?", help="spider name")
+
+    add = commands.add_parser("add", help="add an exported gym file as a run")
+    add.add_argument("gym", help="spider name")
+    add.add_argument("path", help="exported json lines file")
+    add.add_argument("--at", type=parse_time, help="run time, default to now")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.db)
+    try:
+        if args.command == "prices":
+            rows = store.prices(
+                args.gym, args.category, args.title, args.since, args.until
+            )
+            _print_rows(rows if args.all else changes(rows))
+        elif args.command == "at":
+            _print_rows(
+                (
+                    package.category,
+                    package.title,
+                    package.currency_symbol,
+                    package.price,
+                    package.validity,
+                )
+                for package in store.at(args.gym, args.when)
+            )
+        elif args.command == "runs":
+            _print_rows(store.runs(args.gym))
+        else:
+            run_at = args.at or format_time(datetime.now(timezone.utc))
+            with open(args.path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        data = json.loads(line)
+                        store.add_run(
+                            args.gym,
+                            data["name"],
+                            run_at,
+                            (PackageItem.from_dict(item) for item in data["packages"]),
+                            partial=data.get("partial", False),
+                        )
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
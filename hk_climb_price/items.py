@@ -3,32 +3,182 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
-from dataclasses import asdict, dataclass, field
+import sys
+from dataclasses import dataclass, field, fields
 from pprint import pformat
-from typing import Optional, Sequence
+from typing import Any, Dict, Iterable, Optional, Tuple
 
-import scrapy
 
+def _slotted(cls: type) -> type:
+    """
+    Recreate a frozen dataclass with ``__slots__``, like ``dataclass(slots=True)``
+    of Python 3.10 does
+    """
+    names = tuple(spec.name for spec in fields(cls))
+    namespace = dict(cls.__dict__)
+    for name in (*names, "__dict__", "__weakref__"):
+        namespace.pop(name, None)
+    namespace["__slots__"] = names
+
+    # Frozen instances can not be restored with setattr(), fill the slots
+    setters = []
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in names)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        for setter, value in zip(setters, state):
+            setter(self, value)
+
+    namespace["__getstate__"] = __getstate__
+    namespace["__setstate__"] = __setstate__
+    slotted = type(cls)(cls.__name__, cls.__bases__, namespace)
+    slotted.__qualname__ = cls.__qualname__
+    setters.extend(slotted.__dict__[name].__set__ for name in names)
+    # A mutable class of the same layout, whose instances are filled with
+    # plain attribute stores then turned into the frozen class
+    slotted._mutable = type(f"_Mutable{cls.__name__}", (), {"__slots__": names})
+    return slotted
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _tags(tags: Iterable[Optional[str]]) -> Tuple[str, ...]:
+    # Snapshots of parsers before optional fields hold null for missing tags
+    if isinstance(tags, (set, frozenset)):
+        tags = sorted(tags)
+    return tuple([_intern(tag) for tag in tags if tag is not None])
 
-@dataclass
+
+@_slotted
+@dataclass(frozen=True)
 class PackageItem:
     """
     Data model of a product item
+
+    Items are immutable. Category, currency symbol and tags are interned, as
+    the same few strings repeat across every package and snapshot.
+
+    Duration, audience, visits, shareable and per month are read from the
+    texts of the package once, at ingest, by ``hk_climb_price.normalize``.
     """
 
     title: str
     category: str
-    tags: Sequence[str] = field(default_factory=list)
+    tags: Tuple[str, ...] = field(default=())
     currency_symbol: str = field(default="$")
-    price: int = field(default_factory=int)
+    price: int = field(default=0)
     validity: Optional[str] = field(default=None)
+    # Days the package is valid for
+    duration_days: Optional[int] = field(default=None)
+    # adult, student or child, None if anyone may buy it
+    audience: Optional[str] = field(default=None)
+    # Visits included, None if unlimited or unknown
+    visits: Optional[int] = field(default=None)
+    shareable: bool = field(default=False)
+    # The price is paid every month of the duration
+    per_month: bool = field(default=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "category", _intern(self.category))
+        object.__setattr__(self, "currency_symbol", _intern(self.currency_symbol))
+        object.__setattr__(self, "tags", _tags(self.tags))
+        object.__setattr__(self, "audience", _intern(self.audience))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PackageItem":
+        # Skip the frozen __init__, which goes through object.__setattr__(), and
+        # the slot descriptors of __setstate__()
+        get = data.get
+        item = object.__new__(cls._mutable)
+        item.title = data["title"]
+        item.category = sys.intern(data["category"])
+        item.tags = _tags(get("tags", ()))
+        item.currency_symbol = sys.intern(get("currency_symbol", "$"))
+        item.price = get("price", 0)
+        item.validity = get("validity")
+        item.duration_days = get("duration_days")
+        item.audience = _intern(get("audience"))
+        item.visits = get("visits")
+        item.shareable = get("shareable", False)
+        item.per_month = get("per_month", False)
+        item.__class__ = cls
+        return item
 
+    def normalized(
+        self,
+        duration_days: Optional[int],
+        audience: Optional[str],
+        visits: Optional[int],
+        shareable: bool,
+        per_month: bool,
+    ) -> "PackageItem":
+        """
+        Copy of the package with the fields read by ``hk_climb_price.normalize``
+        """
+        # Skip the frozen __init__ like from_dict() does
+        item = object.__new__(PackageItem._mutable)
+        item.title = self.title
+        item.category = self.category
+        item.tags = self.tags
+        item.currency_symbol = self.currency_symbol
+        item.price = self.price
+        item.validity = self.validity
+        item.duration_days = duration_days
+        item.audience = _intern(audience)
+        item.visits = visits
+        item.shareable = shareable
+        item.per_month = per_month
+        item.__class__ = PackageItem
+        return item
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "category": self.category,
+            "tags": list(self.tags),
+            "currency_symbol": self.currency_symbol,
+            "price": self.price,
+            "validity": self.validity,
+            "duration_days": self.duration_days,
+            "audience": self.audience,
+            "visits": self.visits,
+            "shareable": self.shareable,
+            "per_month": self.per_month,
+        }
+
+
+@_slotted
+@dataclass(frozen=True)
 class ClimbGym:
     name: str
     link: str
-    packages: Sequence[PackageItem] = field(default_factory=set)
+    packages: Tuple[PackageItem, ...] = field(default=())
+    # Some parser of the gym failed, some packages are missing
+    partial: bool = field(default=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "packages", tuple(self.packages))
 
     def __str__(self) -> str:
-        return pformat(asdict(self))
+        return pformat(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClimbGym":
+        gym = object.__new__(cls._mutable)
+        gym.name = data["name"]
+        gym.link = data["link"]
+        gym.packages = tuple(map(PackageItem.from_dict, data["packages"]))
+        gym.partial = data.get("partial", False)
+        gym.__class__ = cls
+        return gym
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "link": self.link,
+            "packages": [package.to_dict() for package in self.packages],
+            "partial": self.partial,
+        }
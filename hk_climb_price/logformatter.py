@@ -0,0 +1,19 @@
+"""
+Log formatter of the project
+"""
+
+from scrapy.logformatter import LogFormatter
+
+from hk_climb_price.pipelines import Aggregated
+
+
+class HkClimbPriceLogFormatter(LogFormatter):
+    """
+    Keep packages aggregated into their gym record out of the dropped items
+    warnings
+    """
+
+    def dropped(self, item, exception, response, spider):
+        if isinstance(exception, Aggregated):
+            return None
+        return super().dropped(item, exception, response, spider)
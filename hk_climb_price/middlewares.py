@@ -3,11 +3,21 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import hashlib
+import os
+import time
+
 from scrapy import signals
+from scrapy.downloadermiddlewares.robotstxt import RobotsTxtMiddleware
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.project import data_path
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from hk_climb_price.archive import ResponseArchive
+from hk_climb_price.helpers import dump_json, load_json
+
 
 class HkClimbPriceSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -57,47 +67,169 @@ class HkClimbPriceSpiderMiddleware:
 
 
 class HkClimbPriceDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    """
+    Revalidate price pages with conditional GET.
+
+    The ETag, Last-Modified and body hash of every page are kept per spider in
+    ``CONDITIONAL_GET_DIR``. A page answered with 304, or with the same body as
+    the last run, is dropped before reaching ``parse()``. The outcome of every
+    fetch is counted in the ``conditional_get/<status>`` stats.
+    """
+
+    NETWORK = "network"
+    NOT_MODIFIED = "not_modified"
+    IDENTICAL = "identical"
+
+    def __init__(self, store_dir, stats):
+        self.store_dir = store_dir
+        self.stats = stats
+        self.validators = {}
+        self.pending = {}
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        if not crawler.settings.getbool("CONDITIONAL_GET_ENABLED"):
+            raise NotConfigured
+        if crawler.settings.get("ARCHIVE_MODE"):
+            # Archives need the full response of every request
+            raise NotConfigured
+        store_dir = data_path(crawler.settings.get("CONDITIONAL_GET_DIR"))
+        s = cls(store_dir, crawler.stats)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
+    def _store_path(self, spider):
+        return os.path.join(self.store_dir, f"{spider.name}.json")
+
+    def _revalidates(self, request):
+        return not (
+            request.meta.get("dont_obey_robotstxt")
+            or request.meta.get("dont_revalidate")
+        )
+
+    def _record(self, status, request, spider):
+        self.stats.inc_value(f"conditional_get/{status}", spider=spider)
+        spider.logger.info(f"Conditional GET {status}: {request.url}")
+
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        if not self._revalidates(request):
+            return None
+        validators = self.validators.get(request.url, {})
+        if validators.get("etag"):
+            request.headers.setdefault("If-None-Match", validators["etag"])
+        if validators.get("last_modified"):
+            request.headers.setdefault("If-Modified-Since", validators["last_modified"])
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
-
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if not self._revalidates(request):
+            return response
+        if response.status == 304:
+            self._record(self.NOT_MODIFIED, request, spider)
+            raise IgnoreRequest(f"Not modified: {request.url}")
+        if response.status != 200:
+            return response
+
+        body_hash = hashlib.sha1(response.body).hexdigest()
+        previous = self.validators.get(request.url, {})
+        self.pending[request.url] = {
+            "etag": response.headers.get("ETag", b"").decode("latin-1"),
+            "last_modified": response.headers.get("Last-Modified", b"").decode(
+                "latin-1"
+            ),
+            "body_hash": body_hash,
+        }
+        if previous.get("body_hash") == body_hash:
+            self._record(self.IDENTICAL, request, spider)
+            raise IgnoreRequest(f"Identical body: {request.url}")
+        self._record(self.NETWORK, request, spider)
         return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+    def spider_opened(self, spider):
+        spider.logger.info('Spider opened: %s' % spider.name)
+        self.validators = load_json(self._store_path(spider), default={})
+
+    def spider_closed(self, spider, reason):
+        # Only trust the new validators once the pages were parsed without error
+        if reason != "finished" or self.stats.get_value("log_count/ERROR"):
+            return
+        self.validators.update(self.pending)
+        dump_json(self._store_path(spider), self.validators)
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+
+class HkClimbPriceArchiveMiddleware:
+    """
+    Record raw responses into, or replay them from, a ResponseArchive.
+
+    With ``ARCHIVE_MODE = "record"`` every downloaded response is stored under
+    ``ARCHIVE_DIR/<spider>``. With ``ARCHIVE_MODE = "replay"`` responses are
+    served from the archive only, and requests never recorded are ignored
+    without touching the network.
+    """
+
+    RECORD = "record"
+    REPLAY = "replay"
+
+    def __init__(self, mode, archive_dir, stats):
+        self.mode = mode
+        self.archive_dir = archive_dir
+        self.stats = stats
+        self.archive = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get("ARCHIVE_MODE")
+        if not mode:
+            raise NotConfigured
+        if mode not in (cls.RECORD, cls.REPLAY):
+            raise ValueError(f"Unknown ARCHIVE_MODE: {mode}")
+        archive_dir = data_path(crawler.settings.get("ARCHIVE_DIR"))
+        s = cls(mode, archive_dir, crawler.stats)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        return s
+
+    def process_request(self, request, spider):
+        if self.mode != self.REPLAY:
+            return None
+        response = self.archive.retrieve(request)
+        if response is None:
+            self.stats.inc_value("archive/missing", spider=spider)
+            raise IgnoreRequest(f"Not archived: {request.url}")
+        self.stats.inc_value("archive/replayed", spider=spider)
+        response.flags.append("archived")
+        return response
+
+    def process_response(self, request, response, spider):
+        if self.mode == self.RECORD:
+            self.archive.store(request, response)
+            self.stats.inc_value("archive/recorded", spider=spider)
+        return response
 
     def spider_opened(self, spider):
-        spider.logger.info('Spider opened: %s' % spider.name)
+        self.archive = ResponseArchive.from_spider(self.archive_dir, spider.name)
+        spider.logger.info(f"Archive {self.mode}: {self.archive.directory}")
+
+
+class HkClimbPriceRobotsTxtMiddleware(RobotsTxtMiddleware):
+    """
+    Obey robots.txt like Scrapy, with the parsed robots.txt of every domain
+    shared by the crawlers of the process for ``ROBOTSTXT_CACHE_SECONDS``.
+
+    A resident daemon then fetches robots.txt once a day, not on every check.
+    """
+
+    # Parser and fetch time of every domain
+    parsers = {}
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.ttl = crawler.settings.getfloat("ROBOTSTXT_CACHE_SECONDS")
+        now = time.time()
+        for netloc, (parser, fetched_at) in self.parsers.items():
+            if now - fetched_at < self.ttl:
+                self._parsers[netloc] = parser
+
+    def _parse_robots(self, response, netloc, spider):
+        super()._parse_robots(response, netloc, spider)
+        self.parsers[netloc] = (self._parsers[netloc], time.time())
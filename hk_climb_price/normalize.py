@@ -0,0 +1,176 @@
+"""
+Structured fields of a package read from its free texts
+
+Each field has a table of rules, tried in order on a text of the package. The
+same few titles, validities and tags repeat across every package and crawl,
+so the result of every text, and of every package, is memoized.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Optional, Pattern, Sequence, Tuple
+
+from hk_climb_price.items import PackageItem
+
+DAYS_PER_MONTH = 30
+
+SINGLE_VISIT_CATEGORIES = frozenset(("day-pass", "section-pass"))
+UNLIMITED_CATEGORIES = frozenset(("month-pass", "membership"))
+
+NUMERALS = {
+    "一": 1,
+    "二": 2,
+    "兩": 2,
+    "三": 3,
+    "四": 4,
+    "五": 5,
+    "六": 6,
+    "七": 7,
+    "八": 8,
+    "九": 9,
+}
+UNIT_DAYS = {
+    "日": 1,
+    "天": 1,
+    "day": 1,
+    "週": 7,
+    "星期": 7,
+    "week": 7,
+    "月": DAYS_PER_MONTH,
+    "month": DAYS_PER_MONTH,
+    "年": 365,
+    "year": 365,
+}
+
+# Rule: pattern searched in a text, and the value of a match
+Rule = Tuple[Pattern, Callable[[re.Match], object]]
+
+
+def _number(text: str) -> int:
+    if text.isdigit():
+        return int(text)
+    if "十" not in text:
+        return NUMERALS.get(text, 0)
+    # Chinese numerals up to 99, e.g. 十, 十二, 二十四
+    tens, _, units = text.rpartition("十")
+    return NUMERALS.get(tens, 1) * 10 + NUMERALS.get(units, 0)
+
+
+def _duration(match: re.Match) -> int:
+    return _number(match.group(1)) * UNIT_DAYS[match.group(2).lower()]
+
+
+# e.g. 一日, 1 day, 一個月, 3個月, 3 months, 12個月
+DURATION_RULES: Sequence[Rule] = (
+    (
+        re.compile(
+            r"(\d+|[一二兩三四五六七八九十]+)\s*個?\s*" r"(日|天|週|星期|月|年|day|week|month|year)",
+            re.IGNORECASE,
+        ),
+        _duration,
+    ),
+)
+# Most specific first, e.g. "10 Pass - Student under 18" is for children
+AUDIENCE_RULES: Sequence[Rule] = (
+    (re.compile(r"under\s*18|小童|兒童|child|kid", re.IGNORECASE), lambda _: "child"),
+    (re.compile(r"student|學生", re.IGNORECASE), lambda _: "student"),
+    (re.compile(r"adult|成人", re.IGNORECASE), lambda _: "adult"),
+)
+# e.g. 10 Pass, 5 Share Pass, 共享攀 10次套票, Clip n Climb 1節
+VISITS_RULES: Sequence[Rule] = (
+    (
+        re.compile(r"(\d+)\s*(?:次|節|(?:share\s+)?pass)", re.IGNORECASE),
+        lambda match: int(match.group(1)),
+    ),
+)
+SHAREABLE_RULES: Sequence[Rule] = (
+    (re.compile(r"non-?transferable|不可轉讓|只限本人", re.IGNORECASE), lambda _: False),
+    (re.compile(r"share|共享", re.IGNORECASE), lambda _: True),
+)
+# Memberships on contract, paid by credit card every month
+PER_MONTH_RULES: Sequence[Rule] = (
+    (re.compile(r"合約|自動繳費|monthly|per month", re.IGNORECASE), lambda _: True),
+)
+
+
+def _apply(rules: Sequence[Rule], text: Optional[str]) -> object:
+    if text:
+        for pattern, value in rules:
+            match = pattern.search(text)
+            if match is not None:
+                return value(match)
+    return None
+
+
+@lru_cache(maxsize=None)
+def duration_days(text: Optional[str]) -> Optional[int]:
+    return _apply(DURATION_RULES, text)
+
+
+@lru_cache(maxsize=None)
+def audience(text: Optional[str]) -> Optional[str]:
+    return _apply(AUDIENCE_RULES, text)
+
+
+@lru_cache(maxsize=None)
+def visits(text: Optional[str]) -> Optional[int]:
+    return _apply(VISITS_RULES, text)
+
+
+@lru_cache(maxsize=None)
+def shareable(text: Optional[str]) -> Optional[bool]:
+    return _apply(SHAREABLE_RULES, text)
+
+
+@lru_cache(maxsize=None)
+def per_month(text: Optional[str]) -> Optional[bool]:
+    return _apply(PER_MONTH_RULES, text)
+
+
+def _first(rule: Callable[[Optional[str]], object], texts: Sequence[str]) -> object:
+    for text in texts:
+        value = rule(text)
+        if value is not None:
+            return value
+    return None
+
+
+@lru_cache(maxsize=None)
+def _fields(
+    category: str, title: str, validity: Optional[str], tags: Tuple[str, ...]
+) -> Tuple[Optional[int], Optional[str], Optional[int], bool, bool]:
+    texts = (title, *tags)
+    if category in SINGLE_VISIT_CATEGORIES:
+        days, count = duration_days(validity) or 1, 1
+    else:
+        days = duration_days(validity) or duration_days(title)
+        count = None if category in UNLIMITED_CATEGORIES else visits(title)
+    share = _first(shareable, texts)
+    return (
+        days,
+        _first(audience, texts),
+        count,
+        category == "share-pass" if share is None else share,
+        category == "membership" and bool(_first(per_month, texts)),
+    )
+
+
+def normalize(item: PackageItem) -> PackageItem:
+    """
+    Package with the fields read from its category, title, validity and tags
+    """
+    days, who, count, share, monthly = _fields(
+        item.category, item.title, item.validity, item.tags
+    )
+    return item.normalized(
+        duration_days=days,
+        audience=who,
+        visits=count,
+        shareable=share,
+        per_month=monthly,
+    )
+
+
+def cache_clear() -> None:
+    for rule in (_fields, duration_days, audience, visits, shareable, per_month):
+        rule.cache_clear()
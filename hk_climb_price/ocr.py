@@ -0,0 +1,309 @@
+"""
+Packages of gyms publishing their price lists as images only
+
+Images are recognized by a local OCR engine, Tesseract through pytesseract,
+in a pool of processes. The text of every image is cached by the digest of
+its bytes and by its perceptual hash, so an unchanged image is never
+recognized again, even re-encoded by the site.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.utils.project import data_path
+from twisted.python.failure import Failure
+
+from hk_climb_price.helpers import (
+    breakdown_price_tag,
+    dump_json,
+    load_json,
+    process_text,
+)
+from hk_climb_price.items import PackageItem
+from hk_climb_price.offload import deferred_from_future
+from hk_climb_price.spider import BaseGymSpider
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+# "<title> (<validity>) $<price> <tags>", symbol and amount may be apart
+PRICE = re.compile(r"(?P<symbol>[$¥€£])\s?(?P<amount>\d[\d,]*)")
+VALIDITY = re.compile(r"\((?P<validity>[^)]*)\)")
+
+# Tesseract reads text best around 30 pixels high
+MIN_OCR_WIDTH = 1600
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def perceptual_hash(data: bytes, size: int) -> str:
+    """Difference hash of an image, ``size`` columns wide
+
+    A bit tells whether a cell of the downscaled grayscale image is darker
+    than its right neighbour. Re-encoding or resizing the image keeps the
+    bits, while ``size`` is fine enough for a changed digit of a price list
+    to flip some of them. The image size is part of the hash.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        rows = max(1, round(size * height / width))
+        pixels = list(image.convert("L").resize((size + 1, rows), Image.BOX).getdata())
+    bits = bytearray()
+    for row in range(rows):
+        line = pixels[row * (size + 1) : (row + 1) * (size + 1)]
+        bits.extend(left > right for left, right in zip(line, line[1:]))
+    digest = hashlib.sha1(bytes(bits)).hexdigest()
+    return f"{width}x{height}:{digest}"
+
+
+def recognize(data: bytes, languages: str, config: str) -> str:
+    """
+    Text of an image, run in the processes of the pool
+    """
+    # Imported in the workers only, the crawler process never needs it
+    import pytesseract  # pylint: disable=import-outside-toplevel
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.autocontrast(image.convert("L"))
+        if image.width < MIN_OCR_WIDTH:
+            scale = MIN_OCR_WIDTH / image.width
+            image = image.resize(
+                (MIN_OCR_WIDTH, round(image.height * scale)), Image.LANCZOS
+            )
+        return pytesseract.image_to_string(image, lang=languages, config=config)
+
+
+def executor(workers: Optional[int]) -> ProcessPoolExecutor:
+    """
+    Pool of OCR processes, started on first use and kept for the next spiders
+    of the process
+    """
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        # Spawned, like the parse processes of hk_climb_price.offload
+        _executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+class OcrCache:
+    """
+    Text recognized from every image, by perceptual hash, and the perceptual
+    hash of every image by the digest of its bytes
+    """
+
+    # Caches by path, read once per process and kept across the runs of a
+    # resident daemon
+    _loaded: Dict[str, "OcrCache"] = {}
+
+    def __init__(self, path: str):
+        self.path = path
+        data = load_json(path, default={})
+        self.hashes: Dict[str, str] = data.get("hashes", {})
+        self.texts: Dict[str, str] = data.get("texts", {})
+
+    @classmethod
+    def from_path(cls, path: str) -> "OcrCache":
+        if path not in cls._loaded:
+            cls._loaded[path] = cls(path)
+        return cls._loaded[path]
+
+    def get(self, digest: str) -> Optional[str]:
+        phash = self.hashes.get(digest)
+        return None if phash is None else self.texts.get(phash)
+
+    def set(self, digest: str, phash: str, text: Optional[str] = None) -> None:
+        self.hashes[digest] = phash
+        if text is not None:
+            self.texts[phash] = text
+        dump_json(self.path, {"hashes": self.hashes, "texts": self.texts}, indent=1)
+
+
+class PriceListText:
+    """
+    Read the packages of the text of a price list image
+
+    A line with a price is a package: the text before the price is its title,
+    the text in parentheses its validity, the text after the price its tags.
+    A line without a price is a heading, prefixing the titles of the packages
+    below it. Packages take the category of the first of ``categories``, pairs
+    of a pattern and a category, matching their title; packages matching none
+    are left out.
+    """
+
+    def __init__(self, categories: Sequence[Tuple[str, str]]):
+        self.categories: Tuple[Tuple[Pattern, str], ...] = tuple(
+            (re.compile(pattern, re.IGNORECASE), category)
+            for pattern, category in categories
+        )
+
+    def category(self, title: str) -> Optional[str]:
+        for pattern, category in self.categories:
+            if pattern.search(title):
+                return category
+        return None
+
+    def package(self, heading: str, line: str) -> Optional[PackageItem]:
+        price = PRICE.search(line)
+        validity = VALIDITY.search(line)
+        name = VALIDITY.sub(" ", line[: price.start()])
+        title = " ".join(filter(None, (heading, process_text(name))))
+        category = self.category(title)
+        if category is None:
+            return None
+        tags = process_text(VALIDITY.sub(" ", line[price.end() :]))
+        return PackageItem(
+            title=" ".join(title.split()),
+            category=category,
+            validity=process_text(validity["validity"]) if validity else None,
+            tags=(tags,) if tags else (),
+            **breakdown_price_tag(price["symbol"] + price["amount"]),
+        )
+
+    def packages(self, text: str) -> List[PackageItem]:
+        packages = []
+        heading = ""
+        for line in text.splitlines():
+            line = " ".join(line.split())
+            if not line:
+                continue
+            if not PRICE.search(line):
+                heading = process_text(line)
+                continue
+            package = self.package(heading, line)
+            if package is not None:
+                packages.append(package)
+        return packages
+
+
+class PageTexts:
+    """
+    Texts of the price images of a page, in their order on the page, filled
+    as the images come in. None for an image which could not be read.
+    """
+
+    def __init__(self, count: int):
+        self.texts: List[Optional[str]] = [None] * count
+        self.pending = count
+
+    def add(self, index: int, text: Optional[str]) -> bool:
+        """Keep the text of an image
+
+        Returns:
+            bool: whether the texts of all the images are in
+        """
+        self.texts[index] = text
+        self.pending -= 1
+        return not self.pending
+
+
+class ImagePriceSpider(BaseGymSpider):
+    """
+    Base class of a spider of a gym whose prices are images
+
+    ``parse_gym()`` downloads the images selected by ``image_css`` from the
+    price page. Their text is read from ``OCR_CACHE``, or recognized in the
+    pool of ``OCR_WORKERS`` processes, then parsed into packages by
+    ``price_list`` in the order of the images on the page, once all of them
+    are in. The texts of a page travel with the requests of its images.
+
+    The page and the images are always downloaded in full: the same page may
+    point to new images under the same urls. A warm cache costs the downloads
+    and the digests of the images only. Cache hits and recognitions are
+    counted in the ``ocr/*`` stats.
+    """
+
+    image_css: str = "img::attr(src)"
+    price_list: PriceListText
+    # parse_gym() yields the requests of the images, and OCR has a pool
+    offload_parse = False
+
+    def start_requests(self) -> Iterable[Request]:
+        for url in self.start_urls:
+            yield Request(url, dont_filter=True, meta={"dont_revalidate": True})
+
+    def parse_gym(self, response: Response) -> Iterable[Any]:
+        urls = list(dict.fromkeys(response.css(self.image_css).getall()))
+        if not urls:
+            self.logger.error(f"No price image found in {response.url}")
+            self.crawler.stats.inc_value("gym/parser_errors", spider=self)
+            return
+        texts = PageTexts(len(urls))
+        for index, url in enumerate(urls):
+            yield Request(
+                response.urljoin(url),
+                callback=self.parse_image,
+                errback=self.image_failed,
+                cb_kwargs={"texts": texts, "index": index},
+                meta={"dont_revalidate": True},
+            )
+
+    async def _text(self, data: bytes) -> str:
+        settings = self.settings
+        stats = self.crawler.stats
+        cache = OcrCache.from_path(data_path(settings.get("OCR_CACHE")))
+        digest = hashlib.sha1(data).hexdigest()
+        text = cache.get(digest)
+        if text is not None:
+            stats.inc_value("ocr/cache_hit", spider=self)
+            return text
+
+        if Image is None:
+            raise RuntimeError("Pillow and pytesseract are needed to read images")
+        phash = perceptual_hash(data, settings.getint("OCR_HASH_SIZE"))
+        text = cache.texts.get(phash)
+        if text is not None:
+            # The same image, encoded differently
+            stats.inc_value("ocr/hash_hit", spider=self)
+            cache.set(digest, phash)
+            return text
+
+        start = time.perf_counter()
+        future = executor(settings.getint("OCR_WORKERS") or None).submit(
+            recognize, data, settings.get("OCR_LANGUAGES"), settings.get("OCR_CONFIG")
+        )
+        text = await deferred_from_future(future)
+        stats.inc_value("ocr/recognized", spider=self)
+        stats.inc_value("ocr/seconds", time.perf_counter() - start, spider=self)
+        cache.set(digest, phash, text)
+        return text
+
+    async def parse_image(
+        self, response: Response, texts: PageTexts, index: int
+    ) -> List[PackageItem]:
+        try:
+            text = await self._text(response.body)
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception(f"Fail to read the price image {response.url}")
+            self.crawler.stats.inc_value("gym/parser_errors", spider=self)
+            text = None
+        return self._received(texts, index, text)
+
+    def image_failed(self, failure: Failure) -> List[PackageItem]:
+        self.logger.error(f"Fail to download the price image: {failure.value!r}")
+        self.crawler.stats.inc_value("gym/parser_errors", spider=self)
+        return self._received(**failure.request.cb_kwargs, text=None)
+
+    def _received(
+        self, texts: PageTexts, index: int, text: Optional[str]
+    ) -> List[PackageItem]:
+        if not texts.add(index, text):
+            return []
+        return list(
+            self.parse_packages(
+                partial(self.price_list.packages, text)
+                for text in texts.texts
+                if text is not None
+            )
+        )
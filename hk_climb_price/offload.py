@@ -0,0 +1,158 @@
+"""
+Parsing of responses off the reactor thread, in a pool of threads or processes
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Response, TextResponse
+from scrapy.settings import Settings
+from scrapy.utils.misc import load_object
+from scrapy.utils.project import data_path
+from twisted.internet import defer, reactor, threads
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+
+from hk_climb_price.fingerprint import FingerprintStore
+
+THREAD = "thread"
+PROCESS = "process"
+
+_thread_pool: Optional[ThreadPool] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Spiders of a worker process by class path, each with its own crawler
+_spiders: Dict[str, Any] = {}
+
+
+def deferred_from_future(future: Future) -> defer.Deferred:
+    """
+    Deferred firing in the reactor thread with the result of a future of a
+    ``concurrent.futures`` executor
+    """
+    deferred = defer.Deferred()
+
+    def done(future: Future) -> None:
+        try:
+            result = future.result()
+        except Exception:  # pylint: disable=broad-except
+            reactor.callFromThread(deferred.errback, Failure())
+        else:
+            reactor.callFromThread(deferred.callback, result)
+
+    future.add_done_callback(done)
+    return deferred
+
+
+def thread_pool(workers: int) -> ThreadPool:
+    """
+    Pool of parse threads, started on first use and stopped with the reactor
+    """
+    global _thread_pool  # pylint: disable=global-statement
+    if _thread_pool is None:
+        _thread_pool = ThreadPool(1, workers or os.cpu_count() or 1, name="parse")
+        _thread_pool.start()
+        reactor.addSystemEventTrigger("during", "shutdown", _thread_pool.stop)
+    return _thread_pool
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool of parse processes, started on first use and kept for the next
+    spiders of the process
+
+    Workers are spawned, not forked: a fork would copy the reactor and the
+    locks its threads hold.
+    """
+    global _process_pool  # pylint: disable=global-statement
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=workers or None, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def in_thread(workers: int, func: Any, *args: Any) -> defer.Deferred:
+    return threads.deferToThreadPool(reactor, thread_pool(workers), func, *args)
+
+
+def _worker_spider(spider_path: str, settings: Dict[str, Any]) -> Any:
+    if spider_path not in _spiders:
+        spider_cls = load_object(spider_path)
+        crawler = Crawler(spider_cls, Settings(settings))
+        _spiders[spider_path] = spider_cls.from_crawler(crawler)
+    return _spiders[spider_path]
+
+
+def parse_in_worker(
+    spider_path: str,
+    settings: Dict[str, Any],
+    response_path: str,
+    url: str,
+    body: bytes,
+    encoding: Optional[str],
+    fingerprint: Optional[Dict[str, Any]],
+) -> Tuple[List[Any], Optional[str], Dict[str, Any]]:
+    """Run ``parse_page()`` of a spider over a response, in a worker process
+
+    The spider is created once per worker with the settings of the crawler.
+    The fingerprint entry of the url is handed over by the crawler process,
+    which alone writes the fingerprint store, and the stats of the parse are
+    returned to be added to the stats of the crawler.
+
+    Returns:
+        Tuple[List[Any], Optional[str], Dict[str, Any]]: the items, the new
+        fingerprint of the url to store with them if any, and the stats
+    """
+    spider = _worker_spider(spider_path, settings)
+    stats = spider.crawler.stats
+    stats.clear_stats()
+    store = FingerprintStore.in_memory(
+        data_path(spider.settings.get("FINGERPRINT_DIR")),
+        spider.name,
+        {url: fingerprint} if fingerprint else {},
+    )
+
+    kwargs = {"encoding": encoding} if encoding else {}
+    response = load_object(response_path)(url=url, body=body, **kwargs)
+    items = list(spider.parse_page(response))
+    entry = store.entries.get(url)
+    digest = entry["fingerprint"] if entry and entry != fingerprint else None
+    return items, digest, stats.get_stats()
+
+
+def in_process(workers: int, spider: Any, response: Response) -> defer.Deferred:
+    """Parse a response with ``parse_page()`` of the spider in a worker process
+
+    Returns:
+        defer.Deferred: fires with the items, once the fingerprint store and
+        the stats of the spider are updated
+    """
+    spider_cls = type(spider)
+    store = spider.fingerprint_store()
+    future = process_pool(workers).submit(
+        parse_in_worker,
+        f"{spider_cls.__module__}.{spider_cls.__qualname__}",
+        spider.settings.copy_to_dict(),
+        f"{type(response).__module__}.{type(response).__qualname__}",
+        response.url,
+        response.body,
+        response.encoding if isinstance(response, TextResponse) else None,
+        store.entries.get(response.url),
+    )
+
+    def parsed(result: Tuple[List[Any], Optional[str], Dict[str, Any]]) -> List[Any]:
+        items, digest, stats = result
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                spider.crawler.stats.inc_value(key, value, spider=spider)
+            else:
+                spider.crawler.stats.set_value(key, value, spider=spider)
+        if digest is not None:
+            store.set(response.url, digest, items)
+        return items
+
+    return deferred_from_future(future).addCallback(parsed)
@@ -1,18 +1,202 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
 
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
 from scrapy import Selector
+from scrapy.http import TextResponse
+from scrapy.selector import SelectorList
 
 from hk_climb_price.items import PackageItem
 
+Selectable = Union[TextResponse, Selector, SelectorList]
+
+
+class Query:
+    """
+    XPath expression compiled once and shared by every parser
+
+    Use ``xpath()`` or ``css()`` to declare queries, so that the same
+    expression always maps to the same compiled query.
+    """
+
+    _translator = HTMLTranslator()
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        # lxml evaluators must not be shared between threads
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return f"Query({self.expression!r})"
+
+    @property
+    def _compiled(self) -> etree.XPath:
+        compiled = getattr(self._local, "compiled", None)
+        if compiled is None:
+            compiled = etree.XPath(self.expression, smart_strings=False)
+            self._local.compiled = compiled
+        return compiled
+
+    def _results(self, root: etree._Element) -> List[Any]:
+        result = self._compiled(root)
+        if not isinstance(result, list):
+            result = [result]
+        return result
+
+    def _evaluate(self, selector: Selector) -> Sequence[Selector]:
+        if not isinstance(selector.root, etree._Element):
+            return []
+        return [
+            selector.__class__(
+                root=root,
+                _expr=self.expression,
+                namespaces=selector.namespaces,
+                type=selector.type,
+            )
+            for root in self._results(selector.root)
+        ]
+
+    def __call__(self, selector: Selectable) -> SelectorList:
+        """
+        Evaluate the query, like ``selector.xpath(expression)`` does
+        """
+        if isinstance(selector, TextResponse):
+            selector = selector.selector
+        if isinstance(selector, SelectorList):
+            return SelectorList(
+                result for item in selector for result in self._evaluate(item)
+            )
+        return SelectorList(self._evaluate(selector))
+
+
+_queries: Dict[str, Query] = {}
+
+
+def xpath(expression: str) -> Query:
+    """
+    Compiled query of an xpath expression
+    """
+    query = _queries.get(expression)
+    if query is None:
+        query = _queries[expression] = Query(expression)
+    return query
+
+
+def css(expression: str) -> Query:
+    """
+    Compiled query of a css expression
+    """
+    return xpath(Query._translator.css_to_xpath(expression))
+
+
+def select_sections(selector: Selector, expression: str) -> SelectorList:
+    """Select the sections of a page, one sub-selector per section
+
+    The sections are scoped to the already parsed page tree. Hand them to the
+    parsers directly instead of serializing and re-parsing them with
+    ``Selector(text=section.get())``.
+    """
+    return css(expression)(selector)
+
+
+class DocumentIndex:
+    """
+    Elements of a document by id and by class, built in a single traversal
+
+    Build one index per response and hand it to every parser of the response.
+    Lookups return selectors scoped to the document tree, on which relative
+    queries only walk the selected subtree.
+    """
+
+    def __init__(self, selector: Selectable):
+        if isinstance(selector, TextResponse):
+            selector = selector.selector
+        if isinstance(selector, SelectorList):
+            selector = selector[0] if selector else Selector(text="")
+        if isinstance(selector.root, etree._Element):
+            selector = selector.__class__(
+                root=selector.root.getroottree().getroot(),
+                namespaces=selector.namespaces,
+                type=selector.type,
+            )
+        self.selector = selector
+        self._ids: Optional[Dict[str, List[etree._Element]]] = None
+        self._classes: Dict[str, List[etree._Element]] = {}
+
+    def _build(self) -> None:
+        self._ids = {}
+        if not isinstance(self.selector.root, etree._Element):
+            return
+        for element in self.selector.root.iter(etree.Element):
+            element_id = element.get("id")
+            if element_id:
+                self._ids.setdefault(element_id, []).append(element)
+            for class_name in (element.get("class") or "").split():
+                self._classes.setdefault(class_name, []).append(element)
+
+    def _select(self, elements: Iterable[etree._Element]) -> SelectorList:
+        return SelectorList(
+            self.selector.__class__(
+                root=element,
+                namespaces=self.selector.namespaces,
+                type=self.selector.type,
+            )
+            for element in elements
+        )
+
+    def by_id(self, element_id: str, tag: Optional[str] = None) -> SelectorList:
+        """
+        Elements with the given id, like ``//tag[@id=element_id]``
+        """
+        if self._ids is None:
+            self._build()
+        elements = self._ids.get(element_id, [])
+        return self._select(e for e in elements if tag is None or e.tag == tag)
+
+    def by_class(
+        self, class_name: str, tag: Optional[str] = None, exact: bool = False
+    ) -> SelectorList:
+        """
+        Elements with the given class, like the css ``tag.class_name``, or
+        like ``//tag[@class=class_name]`` if exact
+        """
+        if self._ids is None:
+            self._build()
+        elements = self._classes.get(class_name, [])
+        return self._select(
+            e
+            for e in elements
+            if (tag is None or e.tag == tag)
+            and (not exact or e.get("class") == class_name)
+        )
+
 
 class BasePassParser(ABC):
     """
     Base class of a climb pass parser
+
+    The selector is the page, or the section of it returned by
+    ``select_sections()``, the parser reads from. Parsers declare their
+    queries as class attributes with ``xpath()`` / ``css()`` and call them on
+    a selector. Elements of the whole document are looked up by id or class
+    through ``index``.
     """
 
-    def __init__(self, selector: Selector):
+    def __init__(self, selector: Selectable, index: Optional[DocumentIndex] = None):
         self.selector = selector
+        self._index = index
+
+    @property
+    def index(self) -> DocumentIndex:
+        """
+        Index of the parsed document, shared with the other parsers of the
+        response when given to the constructor
+        """
+        if self._index is None:
+            self._index = DocumentIndex(self.selector)
+        return self._index
 
     @abstractmethod
     def parse(self) -> Sequence[PackageItem]:
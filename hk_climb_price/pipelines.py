@@ -3,11 +3,180 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+from dataclasses import replace
 
-# useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.project import data_path
 
+from hk_climb_price.changes import (
+    append_changes,
+    changes_path,
+    diff,
+    load_snapshot,
+    snapshot_path,
+)
+from hk_climb_price.history import HistoryStore, format_time
+from hk_climb_price.items import ClimbGym, PackageItem
+from hk_climb_price.normalize import normalize
+
+
+class Aggregated(DropItem):
+    """
+    The item is exported as part of its gym record, not on its own
+    """
+
+
+class NormalizePipeline:
+    """
+    Read duration, audience, visits, shareable and per month of every package
+    from its texts, before any other pipeline
+
+    Records re-emitted from fingerprints are normalized again, so that they
+    follow the current rules.
+    """
+
+    def process_item(self, item, spider):
+        if isinstance(item, PackageItem):
+            return normalize(item)
+        if isinstance(item, ClimbGym):
+            return replace(
+                item, packages=[normalize(package) for package in item.packages]
+            )
+        return item
+
+
+class PackagesPipeline:
+    """
+    Collect the packages of a gym spider, to be handled once the spider closes
+    """
+
+    def open_spider(self, spider):
+        self.packages = []
+
+    def process_item(self, item, spider):
+        if isinstance(item, ClimbGym):
+            # Records re-emitted from fingerprints of older runs
+            self.packages.extend(item.packages)
+        elif isinstance(item, PackageItem):
+            self.packages.append(item)
+        return item
+
+
+class HkClimbPricePipeline(PackagesPipeline):
+    """
+    Assemble the packages yielded by a gym spider into its ClimbGym record
+
+    Packages are collected as they are scraped and the record is exported once
+    the spider closes, flagged partial if a parser of the gym failed. Nothing
+    is exported if no package was scraped at all.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
 
-class HkClimbPricePipeline:
     def process_item(self, item, spider):
+        item = super().process_item(item, spider)
+        if isinstance(item, ClimbGym):
+            raise Aggregated(f"Packages added to {item.name}")
+        if isinstance(item, PackageItem):
+            raise Aggregated(f"Package added to {spider.gym_name}")
         return item
+
+    def close_spider(self, spider):
+        if not self.packages:
+            return
+        stats = self.crawler.stats
+        gym = ClimbGym(
+            name=spider.gym_name,
+            link=spider.start_urls[0],
+            packages=self.packages,
+            partial=bool(stats.get_value("gym/parser_errors")),
+        )
+        if gym.partial:
+            stats.set_value("gym/partial", True, spider=spider)
+        stats.set_value("gym/packages", len(gym.packages), spider=spider)
+        self.crawler.signals.send_catch_log(
+            signal=signals.item_scraped, item=gym, response=None, spider=spider
+        )
+
+
+class HistoryPipeline(PackagesPipeline):
+    """
+    Append the packages of every run to the price history in ``HISTORY_DB``
+
+    Runs before HkClimbPricePipeline, which drops the packages it aggregates.
+    The run is written in one transaction once the spider closes.
+    """
+
+    def __init__(self, path, stats):
+        self.path = path
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("HISTORY_ENABLED"):
+            raise NotConfigured
+        if crawler.settings.get("ARCHIVE_MODE") == "replay":
+            # Replays are not new observations of the prices
+            raise NotConfigured
+        return cls(data_path(crawler.settings.get("HISTORY_DB")), crawler.stats)
+
+    def close_spider(self, spider):
+        if not self.packages:
+            return
+        store = HistoryStore(self.path)
+        try:
+            store.add_run(
+                spider.name,
+                spider.gym_name,
+                format_time(self.stats.get_value("start_time")),
+                self.packages,
+                partial=bool(self.stats.get_value("gym/parser_errors")),
+            )
+        finally:
+            store.close()
+        self.stats.set_value("history/packages", len(self.packages), spider=spider)
+
+
+class ChangesPipeline(PackagesPipeline):
+    """
+    Append the packages added, removed or changed since the exported file
+    ``<DOCS_DIR>/<gym>.json`` to ``<DOCS_DIR>/<gym>-changes.jsonl``
+
+    The previous packages are keyed by category and title, the new ones are
+    compared in one pass once the spider closes. Partial runs are skipped, as
+    their missing packages have not been removed from the gym.
+    """
+
+    def __init__(self, docs_dir, stats):
+        self.docs_dir = docs_dir
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CHANGES_ENABLED"):
+            raise NotConfigured
+        if crawler.settings.get("ARCHIVE_MODE") == "replay":
+            # Replayed packages have not changed on the site
+            raise NotConfigured
+        return cls(crawler.settings.get("DOCS_DIR"), crawler.stats)
+
+    def close_spider(self, spider):
+        if not self.packages or self.stats.get_value("gym/parser_errors"):
+            return
+        run_at = format_time(self.stats.get_value("start_time"))
+        previous = load_snapshot(snapshot_path(self.docs_dir, spider.name))
+        records = [
+            {"gym": spider.name, "run_at": run_at, **record}
+            for record in diff(previous, self.packages)
+        ]
+        if not records:
+            return
+        append_changes(changes_path(self.docs_dir, spider.name), records)
+        for record in records:
+            self.stats.inc_value(f"changes/{record['change']}", spider=spider)
@@ -0,0 +1,201 @@
+"""
+Opt-in profiling of the spiders with cProfile and tracemalloc
+
+Nothing here runs unless ``PROFILE_ENABLED`` is set, see
+``hk_climb_price.extensions.ProfilingExtension``.
+"""
+
+import contextlib
+import cProfile
+import linecache
+import os
+import sys
+import tracemalloc
+from collections import Counter
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from hk_climb_price.helpers import dump_text
+from hk_climb_price.parser import BasePassParser
+
+# Profile of the spider parsing right now, parsers report to it
+_active: Optional["SpiderProfile"] = None
+
+# Allocations of the profiling itself
+_IGNORED = (__file__, contextlib.__file__, tracemalloc.__file__)
+
+
+def _short(filename: str) -> str:
+    """
+    Path of a source file relative to the longest ``sys.path`` entry
+    """
+    prefixes = [path for path in sys.path if path and filename.startswith(path)]
+    if not prefixes:
+        return filename
+    return os.path.relpath(filename, max(prefixes, key=len))
+
+
+def _frame(frame: Tuple[str, int]) -> str:
+    return f"{_short(frame[0])}:{frame[1]}"
+
+
+class SpiderProfile:
+    """
+    cProfile statistics and tracemalloc allocations of the parsing of a spider
+
+    Every step of the ``parse()`` generator is profiled on its own, so that
+    the gyms crawled in the same reactor do not end in each other's profile.
+    tracemalloc only traces the steps, allocations are the memory still held
+    at the end of a step, by traceback. Memory is not traced when tracemalloc
+    is started by someone else.
+    """
+
+    def __init__(self, name: str, frames: int = 25):
+        self.name = name
+        self.frames = frames
+        self.traced = not tracemalloc.is_tracing()
+        self.profile = cProfile.Profile()
+        self.stacks: Counter = Counter()
+        self.parsers: Dict[str, List[int]] = {}
+        self.peak = 0
+
+    @contextlib.contextmanager
+    def step(self) -> Iterator[None]:
+        global _active
+        if self.traced:
+            tracemalloc.start(self.frames)
+        _active = self
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+            _active = None
+            if self.traced:
+                self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                self._hold(snapshot)
+
+    def _hold(self, snapshot: tracemalloc.Snapshot) -> None:
+        for statistic in snapshot.statistics("traceback"):
+            if statistic.traceback[-1].filename in _IGNORED:
+                continue
+            stack = tuple(
+                (frame.filename, frame.lineno) for frame in statistic.traceback
+            )
+            self.stacks[stack] += statistic.size
+
+    def wrap(self, parse: Callable[..., Any]) -> Callable[..., Iterator[Any]]:
+        """
+        Wrap a spider callback, profiling every step of its output
+        """
+
+        @wraps(parse)
+        def wrapper(*args: Any, **kwargs: Any) -> Iterator[Any]:
+            with self.step():
+                results = iter(parse(*args, **kwargs) or ())
+            while True:
+                with self.step():
+                    try:
+                        result = next(results)
+                    except StopIteration:
+                        return
+                yield result
+
+        return wrapper
+
+    def parsed(self, name: str, allocated: int) -> None:
+        calls = self.parsers.setdefault(name, [0, 0])
+        calls[0] += 1
+        calls[1] += allocated
+
+    def folded(self) -> str:
+        """
+        Allocations as collapsed stacks, one ``frame;...;frame bytes`` line
+        per traceback, for ``flamegraph.pl`` or speedscope
+        """
+        return "".join(
+            f"{';'.join(_frame(frame) for frame in stack)} {size}\n"
+            for stack, size in sorted(self.stacks.items())
+        )
+
+    def report(self, top: int) -> str:
+        """
+        Peak, memory held by every parser and the top allocation lines
+        """
+        lines_sizes: Counter = Counter()
+        for stack, size in self.stacks.items():
+            lines_sizes[stack[-1]] += size
+        lines = [
+            f"Gym {self.name}",
+            f"Peak memory of a step: {self.peak / 1024:.1f} KiB",
+            f"Held after parsing: {sum(self.stacks.values()) / 1024:.1f} KiB",
+            "",
+            "Parsers (calls, KiB held):",
+        ]
+        for name, (calls, allocated) in sorted(self.parsers.items()):
+            lines.append(f"  {name}: {calls}, {allocated / 1024:.1f}")
+        lines += ["", f"Top {top} allocation lines (KiB):"]
+        for frame, size in lines_sizes.most_common(top):
+            source = linecache.getline(*frame).strip()
+            lines.append(f"  {size / 1024:10.1f}  {_frame(frame)}  {source}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory: str, top: int) -> List[str]:
+        """Write ``<gym>.prof``, ``<gym>.alloc.folded`` and ``<gym>.alloc.txt``
+
+        Returns:
+            List[str]: paths written
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.name)
+        self.profile.dump_stats(f"{path}.prof")
+        dump_text(f"{path}.alloc.folded", self.folded())
+        dump_text(f"{path}.alloc.txt", self.report(top))
+        return [f"{path}.prof", f"{path}.alloc.folded", f"{path}.alloc.txt"]
+
+
+def _profiled_parse(parse: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    @wraps(parse)
+    def wrapper(self: BasePassParser) -> Any:
+        profile = _active
+        if profile is None:
+            return parse(self)
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            return parse(self)
+        finally:
+            profile.parsed(
+                f"{type(self).__name__}.parse",
+                tracemalloc.get_traced_memory()[0] - before,
+            )
+
+    wrapper.profiled = True  # type: ignore
+    return wrapper
+
+
+def _subclasses(cls: type) -> Iterator[type]:
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+def install_parser_hooks() -> int:
+    """Wrap ``parse()`` of every loaded ``BasePassParser`` subclass
+
+    Wrapped parsers report to the profile of the spider they run in, and run
+    as they are outside of a profiled spider.
+
+    Returns:
+        int: parsers wrapped by this call
+    """
+    wrapped = 0
+    for cls in _subclasses(BasePassParser):
+        parse = cls.__dict__.get("parse")
+        if parse is None or getattr(parse, "__isabstractmethod__", False):
+            continue
+        if not getattr(parse, "profiled", False):
+            cls.parse = _profiled_parse(parse)
+            wrapped += 1
+    return wrapped
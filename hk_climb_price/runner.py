@@ -0,0 +1,191 @@
+"""
+Run gym spiders concurrently in a single Scrapy process
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+from typing import Dict, Optional, Sequence
+
+from scrapy.crawler import Crawler, CrawlerProcess, CrawlerRunner
+from scrapy.settings import Settings
+from scrapy.utils.project import get_project_settings
+
+from hk_climb_price import offload
+
+
+def _md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GymCrawl:
+    """
+    Crawl of a single gym, exported to ``<output_dir>/<gym>.json``
+
+    ``changed`` tells whether ``report()`` replaced the exported file.
+    """
+
+    FETCH_STATUSES = {
+        "conditional_get/network": "network hit",
+        "conditional_get/not_modified": "304",
+        "conditional_get/identical": "hash-identical body",
+        "fingerprint/hit": "same fingerprint",
+    }
+
+    def __init__(self, process: CrawlerRunner, name: str, output_dir: str):
+        self.name = name
+        self.output_dir = output_dir
+        self.changed = False
+        self.exist_file = os.path.join(output_dir, f"{name}.json")
+        self.new_file = os.path.join(output_dir, f"{name}-new.json")
+        self.crawler = Crawler(
+            process.spider_loader.load(name), self._settings(process.settings)
+        )
+
+    def _settings(self, base: Settings) -> Settings:
+        settings = base.copy()
+        settings.set(
+            "FEEDS",
+            {self.new_file: {"format": "climbgym", "overwrite": True}},
+            priority="cmdline",
+        )
+        settings.set("DOCS_DIR", self.output_dir, priority="cmdline")
+        if not os.path.exists(self.exist_file):
+            # Nothing to keep if the page turns out to be unchanged
+            settings.set("CONDITIONAL_GET_ENABLED", False, priority="cmdline")
+        return settings
+
+    @property
+    def fetch_status(self) -> str:
+        stats = self.crawler.stats
+        return ", ".join(
+            f"{label} x{stats.get_value(key)}"
+            for key, label in self.FETCH_STATUSES.items()
+            if stats.get_value(key)
+        )
+
+    @property
+    def unchanged(self) -> bool:
+        """Whether every page was skipped by conditional GET"""
+        stats = self.crawler.stats
+        return not stats.get_value("conditional_get/network") and any(
+            stats.get_value(f"conditional_get/{status}")
+            for status in ("not_modified", "identical")
+        )
+
+    @property
+    def partial(self) -> bool:
+        """Whether some parser of the gym failed"""
+        return bool(self.crawler.stats.get_value("gym/partial"))
+
+    @property
+    def failed(self) -> bool:
+        if self.unchanged:
+            return False
+        stats = self.crawler.stats
+        finished = stats.get_value("finish_reason") == "finished"
+        return (
+            not finished or not stats.get_value("item_scraped_count", 0) or self.partial
+        )
+
+    def publish(self) -> bool:
+        """Replace the exported file if the new content differs
+
+        Returns:
+            bool: whether the exported file has changed
+        """
+        if not os.path.exists(self.exist_file) or _md5(self.exist_file) != _md5(
+            self.new_file
+        ):
+            os.replace(self.new_file, self.exist_file)
+            return True
+        os.remove(self.new_file)
+        return False
+
+    def report(self) -> str:
+        if self.failed:
+            if os.path.exists(self.new_file):
+                os.remove(self.new_file)
+            if self.partial:
+                return f"Partial info from Gym {self.name}, keep the last crawl"
+            return f"Fail to crawl info from Gym {self.name}"
+        if self.unchanged:
+            return "Same content as before"
+        self.changed = self.publish()
+        if self.changed:
+            return "New files to be commit"
+        return "Same content as before"
+
+
+def crawl(
+    gyms: Optional[Sequence[str]] = None,
+    output_dir: str = "docs",
+    settings: Optional[Settings] = None,
+) -> Dict[str, GymCrawl]:
+    """Crawl the given gyms (every spider by default) in one reactor
+
+    Returns:
+        Dict[str, GymCrawl]: the finished crawls keyed by spider name
+    """
+    process = CrawlerProcess(settings or get_project_settings())
+    os.makedirs(output_dir, exist_ok=True)
+    crawls = {
+        name: GymCrawl(process, name, output_dir)
+        for name in gyms or process.spider_loader.list()
+    }
+    for gym_crawl in crawls.values():
+        process.crawl(gym_crawl.crawler)
+    process.start()
+    return crawls
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("gyms", nargs="*", help="spider names, default to all")
+    parser.add_argument("-o", "--output-dir", default="docs")
+    parser.add_argument(
+        "-f", "--force", action="store_true", help="skip conditional GET"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile the parsers to <output_dir>/profile, implies --force",
+    )
+    parser.add_argument(
+        "--parse-pool",
+        choices=(offload.THREAD, offload.PROCESS),
+        help="parse pages in a pool of threads or processes",
+    )
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument(
+        "--record", action="store_const", const="record", dest="archive_mode"
+    )
+    archive.add_argument(
+        "--replay", action="store_const", const="replay", dest="archive_mode"
+    )
+    args = parser.parse_args(argv)
+
+    settings = get_project_settings()
+    if args.force or args.profile:
+        settings.set("CONDITIONAL_GET_ENABLED", False, priority="cmdline")
+    if args.profile:
+        settings.set("PROFILE_ENABLED", True, priority="cmdline")
+        settings.set("FINGERPRINT_ENABLED", False, priority="cmdline")
+    if args.parse_pool:
+        settings.set("PARSE_POOL", args.parse_pool, priority="cmdline")
+    if args.archive_mode:
+        settings.set("ARCHIVE_MODE", args.archive_mode, priority="cmdline")
+    crawls = crawl(args.gyms, output_dir=args.output_dir, settings=settings)
+    for name, gym_crawl in crawls.items():
+        fetch_status = gym_crawl.fetch_status or "no fetch"
+        print(f"{name}: {gym_crawl.report()} ({fetch_status})")
+    return int(any(gym_crawl.failed for gym_crawl in crawls.values()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Serve the latest exported gym records over HTTP from an in-memory index
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from dataclasses import replace
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from scrapy.utils.project import get_project_settings
+
+from hk_climb_price.exporters import dumps
+from hk_climb_price.items import ClimbGym, PackageItem
+from hk_climb_price.normalize import normalize
+
+logger = logging.getLogger(__name__)
+
+# Responses kept per index, the cache is emptied when full
+RESPONSE_CACHE_SIZE = 1024
+
+# Path, modification time and size of every exported file
+Signature = Tuple[Tuple[str, int, int], ...]
+
+Response = Tuple[HTTPStatus, Dict[str, str], bytes]
+
+
+def signature(docs_dir: str) -> Signature:
+    files = []
+    for path in sorted(glob.glob(os.path.join(docs_dir, "*.json"))):
+        if path.endswith("-new.json"):
+            continue
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        files.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(files)
+
+
+class PriceIndex:
+    """
+    Immutable index of the packages of every gym
+
+    Packages are sorted by price for every gym, category and gym / category
+    pair, so that a price range is two bisections. Responses are cached on the
+    index, and dropped with it when a new index replaces it.
+    """
+
+    def __init__(self, gyms: Dict[str, ClimbGym], version: str):
+        self.gyms = gyms
+        self.version = version
+        rows = sorted(
+            (
+                (package.price, name, package)
+                for name, gym in gyms.items()
+                for package in gym.packages
+            ),
+            key=lambda row: (row[0], row[1], row[2].category, row[2].title),
+        )
+        sorted_rows: Dict[Tuple[Optional[str], Optional[str]], List] = {}
+        for row in rows:
+            _, name, package = row
+            for key in (
+                (None, None),
+                (name, None),
+                (None, package.category),
+                (name, package.category),
+            ):
+                sorted_rows.setdefault(key, []).append(row)
+        self._rows = {
+            key: ([row[0] for row in values], [row[1:] for row in values])
+            for key, values in sorted_rows.items()
+        }
+        self.responses: Dict[str, Tuple[bytes, str]] = {}
+
+    @classmethod
+    def load(cls, files: Signature) -> "PriceIndex":
+        gyms = {}
+        for path, _, _ in files:
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        gym = ClimbGym.from_dict({"link": "", **json.loads(line)})
+                        gyms[os.path.basename(path)[: -len(".json")]] = replace(
+                            gym,
+                            packages=[normalize(package) for package in gym.packages],
+                        )
+        version = hashlib.sha256(repr(files).encode("utf-8")).hexdigest()[:16]
+        return cls(gyms, version)
+
+    def packages(
+        self,
+        gym: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+    ) -> List[Tuple[str, PackageItem]]:
+        """
+        Packages as (gym, package) in the price range, cheapest first
+        """
+        prices, rows = self._rows.get((gym, category), ((), ()))
+        start = 0 if min_price is None else bisect_left(prices, min_price)
+        end = len(prices) if max_price is None else bisect_right(prices, max_price)
+        return rows[start:end]
+
+
+def _int(query: Dict[str, List[str]], name: str) -> Optional[int]:
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return int(values[0])
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+class PriceServer:
+    """
+    HTTP/1.1 server of a PriceIndex, with keep-alive and ETag revalidation
+
+    ``GET /gyms`` lists the gyms, ``GET /gyms/<gym>`` returns a gym record and
+    ``GET /packages`` the packages filtered by ``gym``, ``category``,
+    ``min_price`` and ``max_price``.
+
+    The exported files are polled every ``interval`` seconds. A new index is
+    built off the event loop then swapped in one assignment: a request is
+    answered from the index current when it arrived, none is dropped.
+    """
+
+    def __init__(self, docs_dir: str, interval: float = 1.0):
+        self.docs_dir = docs_dir
+        self.interval = interval
+        self.files = signature(docs_dir)
+        self.index = PriceIndex.load(self.files)
+
+    async def reload(self) -> bool:
+        """Replace the index if an exported file changed
+
+        Returns:
+            bool: whether the index was replaced
+        """
+        files = signature(self.docs_dir)
+        if files == self.files:
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            index = await loop.run_in_executor(None, PriceIndex.load, files)
+        except (OSError, ValueError):
+            # A file written in place may be read half way, retry next time
+            logger.exception(f"Fail to reload {self.docs_dir}, keep the last index")
+            return False
+        except Exception:  # pylint: disable=broad-except
+            # A malformed file, skipped until the files change again
+            logger.exception(f"Fail to reload {self.docs_dir}, keep the last index")
+            self.files = files
+            return False
+        self.files, self.index = files, index
+        logger.info(f"Reloaded {len(index.gyms)} gyms, version {index.version}")
+        return True
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload()
+            except Exception:  # pylint: disable=broad-except
+                # Keep serving the last index, and keep watching
+                logger.exception(f"Fail to watch {self.docs_dir}")
+
+    def _body(
+        self, index: PriceIndex, path: str, query: Dict[str, List[str]]
+    ) -> Optional[dict]:
+        if path == "/gyms":
+            return {
+                "gyms": [
+                    {"id": name, "name": gym.name, "link": gym.link}
+                    for name, gym in sorted(index.gyms.items())
+                ]
+            }
+        if path.startswith("/gyms/"):
+            gym = index.gyms.get(path[len("/gyms/") :])
+            return None if gym is None else gym.to_dict()
+        if path == "/packages":
+            rows = index.packages(
+                gym=query.get("gym", [None])[0],
+                category=query.get("category", [None])[0],
+                min_price=_int(query, "min_price"),
+                max_price=_int(query, "max_price"),
+            )
+            return {
+                "packages": [
+                    {"gym": name, **package.to_dict()} for name, package in rows
+                ]
+            }
+        return None
+
+    def respond(self, method: str, target: str, headers: Dict[str, str]) -> Response:
+        """
+        Status, headers and body of the response to a request
+        """
+        if method not in ("GET", "HEAD"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": "GET, HEAD"}, b""
+        index = self.index
+        cached = index.responses.get(target)
+        if cached is None:
+            url = urlsplit(target)
+            try:
+                data = self._body(index, url.path, parse_qs(url.query))
+            except ValueError as error:
+                body = dumps({"error": str(error)})
+                return HTTPStatus.BAD_REQUEST, {}, body
+            if data is None:
+                return HTTPStatus.NOT_FOUND, {}, dumps({"error": "not found"})
+            body = dumps(data)
+            # Same body, same tag, across reloads of other gyms
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            if len(index.responses) >= RESPONSE_CACHE_SIZE:
+                index.responses.clear()
+            cached = index.responses[target] = (body, etag)
+        body, etag = cached
+        if etag in headers.get("if-none-match", ""):
+            return HTTPStatus.NOT_MODIFIED, {"ETag": etag}, b""
+        return HTTPStatus.OK, {"ETag": etag, "Cache-Control": "no-cache"}, body
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                status, response_headers, body = self.respond(method, target, headers)
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                )
+                response = [
+                    f"HTTP/1.1 {status.value} {status.phrase}",
+                    "Content-Type: application/json; charset=utf-8",
+                    f"Content-Length: {len(body)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                    *(f"{name}: {value}" for name, value in response_headers.items()),
+                ]
+                writer.write(("\r\n".join(response) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(
+        self,
+        host: str,
+        port: int,
+        ready: Optional[Callable[[Tuple[str, int]], None]] = None,
+    ) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        watcher = asyncio.ensure_future(self.watch())
+        address = server.sockets[0].getsockname()
+        logger.info(f"Serving {len(self.index.gyms)} gyms on {address[0]}:{address[1]}")
+        if ready is not None:
+            ready(address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    settings = get_project_settings()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--docs-dir", default=settings.get("DOCS_DIR"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="seconds between reload checks"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    server = PriceServer(args.docs_dir, args.interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,12 +12,24 @@ BOT_NAME = 'hk_climb_price'
 SPIDER_MODULES = ['hk_climb_price.spiders']
 NEWSPIDER_MODULE = 'hk_climb_price.spiders'
 
+# Spiders by name, only the module of the crawled spider is imported. Add new
+# spiders here, python -m hk_climb_price.spiderloader checks it against
+# SPIDER_MODULES
+SPIDER_LOADER_CLASS = 'hk_climb_price.spiderloader.LazySpiderLoader'
+SPIDER_MANIFEST = {
+    'atticv': 'hk_climb_price.spiders.atticv.AtticVPriceSpider',
+    'justclimb': 'hk_climb_price.spiders.justclimb.JustclimbPriceSpider',
+    'vermcity': 'hk_climb_price.spiders.vermcity.JustclimbPriceSpider',
+}
+
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 #USER_AGENT = 'hk_climb_price (+http://www.yourdomain.com)'
 
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = True
+# Keep the robots.txt of a domain for the next crawlers of the process
+ROBOTSTXT_CACHE_SECONDS = 24 * 3600
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 #CONCURRENT_REQUESTS = 32
@@ -50,21 +62,104 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    'hk_climb_price.middlewares.HkClimbPriceDownloaderMiddleware': 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    'scrapy.downloadermiddlewares.robotstxt.RobotsTxtMiddleware': None,
+    'hk_climb_price.middlewares.HkClimbPriceRobotsTxtMiddleware': 100,
+    'hk_climb_price.middlewares.HkClimbPriceDownloaderMiddleware': 543,
+    'hk_climb_price.middlewares.HkClimbPriceArchiveMiddleware': 901,
+}
+
+# Revalidate price pages with ETag / Last-Modified and skip parsing of pages
+# which have not changed since the last run
+CONDITIONAL_GET_ENABLED = True
+CONDITIONAL_GET_DIR = 'validators'
+
+# Re-emit the items of the last run, without parsing, when the part of the page
+# read by the parsers has the same fingerprint
+FINGERPRINT_ENABLED = True
+FINGERPRINT_DIR = 'fingerprints'
+
+# Parse pages in a pool of threads ('thread') or processes ('process') of
+# PARSE_POOL_WORKERS workers (0: one per CPU), off the reactor thread. None
+# parses in the reactor thread.
+PARSE_POOL = None
+PARSE_POOL_WORKERS = 0
+
+# Text of the price images of image spiders (hk_climb_price.ocr), recognized by
+# Tesseract in OCR_WORKERS processes (0: one per CPU) and cached in
+# OCR_CACHE by image digest and perceptual hash, OCR_HASH_SIZE columns wide
+OCR_CACHE = 'ocr.json'
+OCR_WORKERS = 0
+OCR_LANGUAGES = 'eng+chi_tra'
+OCR_CONFIG = '--psm 6'
+OCR_HASH_SIZE = 128
+
+# Record every response into ARCHIVE_DIR ('record'), or serve responses from it
+# without any network access ('replay'). Replays always run the parsers.
+ARCHIVE_MODE = None
+ARCHIVE_DIR = 'archive'
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 #EXTENSIONS = {
 #    'scrapy.extensions.telnet.TelnetConsole': None,
 #}
+EXTENSIONS = {
+    'hk_climb_price.extensions.CrawlStatsExtension': 500,
+    'hk_climb_price.extensions.ProfilingExtension': 510,
+}
+
+# Write download latency, response size, time, packages and failures of every
+# parser to <STATS_EXPORT_DIR>/<gym>.prom (Prometheus textfile) and <gym>.json
+STATS_EXPORT_ENABLED = True
+STATS_EXPORT_DIR = 'stats'
+
+# Profile parse() of the spiders and parsers with cProfile and tracemalloc, and
+# write <gym>.prof, <gym>.alloc.folded and <gym>.alloc.txt to
+# <DOCS_DIR>/<PROFILE_DIR>, e.g. ./crawl.sh --profile
+PROFILE_ENABLED = False
+PROFILE_DIR = 'profile'
+PROFILE_TRACEMALLOC_FRAMES = 25
+PROFILE_TOP_ALLOCATIONS = 25
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    'hk_climb_price.pipelines.HkClimbPricePipeline': 300,
-#}
+# Spiders yield packages, normalized then assembled into the gym record
+ITEM_PIPELINES = {
+    'hk_climb_price.pipelines.NormalizePipeline': 100,
+    'hk_climb_price.pipelines.HistoryPipeline': 200,
+    'hk_climb_price.pipelines.ChangesPipeline': 250,
+    'hk_climb_price.pipelines.HkClimbPricePipeline': 300,
+}
+LOG_FORMATTER = 'hk_climb_price.logformatter.HkClimbPriceLogFormatter'
+
+# Append the packages of every run to a SQLite price history, queried with
+# python -m hk_climb_price.history
+HISTORY_ENABLED = True
+HISTORY_DB = 'history.sqlite3'
+
+# Append the packages added, removed or changed since the exported file of the
+# gym in DOCS_DIR to <DOCS_DIR>/<gym>-changes.jsonl
+CHANGES_ENABLED = True
+DOCS_DIR = 'docs'
+
+# Static comparison site built from DOCS_DIR with python -m hk_climb_price.site
+SITE_DIR = 'docs/site'
+
+# Resident crawl daemon, python -m hk_climb_price.daemon. A gym is revisited
+# after DAEMON_REVISIT_FACTOR times its mean time between price changes, within
+# DAEMON_MIN_INTERVAL and DAEMON_MAX_INTERVAL seconds. A domain is crawled
+# again DAEMON_DOMAIN_DELAY seconds after the end of its last crawl at least.
+DAEMON_MIN_INTERVAL = 6 * 3600
+DAEMON_MAX_INTERVAL = 14 * 24 * 3600
+DAEMON_REVISIT_FACTOR = 0.5
+DAEMON_DOMAIN_DELAY = 600
+DAEMON_RETRY_INTERVAL = 3600
+
+# Canonical json lines, the same bytes for the same gym records
+FEED_EXPORTERS = {
+    'climbgym': 'hk_climb_price.exporters.ClimbGymJsonLinesExporter',
+}
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
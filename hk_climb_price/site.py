@@ -0,0 +1,274 @@
+"""
+Build the static comparison site from the exported gym files
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import sys
+from dataclasses import replace
+from html import escape
+from typing import Any, Dict, List, Optional, Sequence
+
+from scrapy.utils.project import get_project_settings
+
+from hk_climb_price.compare import PriceTable
+from hk_climb_price.exporters import canonical, dumps
+from hk_climb_price.items import ClimbGym
+from hk_climb_price.normalize import normalize
+
+MANIFEST = "manifest.json"
+
+# Visits per month, months and audience of the ranking on the index page
+PATTERNS = ((4, 1, "adult"), (8, 6, "adult"), (8, 6, "student"))
+
+STYLE = """\
+body { font-family: sans-serif; margin: 2em auto; max-width: 60em; padding: 0 1em; }
+table { border-collapse: collapse; margin-bottom: 2em; width: 100%; }
+th, td { border-bottom: 1px solid #ddd; padding: .3em .5em; text-align: left; }
+td.number { text-align: right; }
+"""
+
+GYM_HEADERS = (
+    "Category",
+    "Package",
+    "Price",
+    "Validity",
+    "Visits",
+    "Audience",
+    "Shareable",
+)
+
+PAGE = """\
+<!DOCTYPE html>
+<html lang="zh-Hant-HK">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<link rel="stylesheet" href="{style}">
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cell(value: Any, number: bool = False) -> str:
+    text = "" if value is None else escape(str(value))
+    return f'<td class="number">{text}</td>' if number else f"<td>{text}</td>"
+
+
+def _table(headers: Sequence[str], rows: Sequence[str]) -> str:
+    head = "".join(f"<th>{escape(header)}</th>" for header in headers)
+    return f"<table>\n<tr>{head}</tr>\n" + "\n".join(rows) + "\n</table>"
+
+
+class SiteBuilder:
+    """
+    Static site of every gym in ``docs_dir``, written to ``output_dir``
+
+    Every gym is a shard, a data file and a page, rebuilt only when the digest
+    of its exported file changes. The combined data file and the index page
+    are assembled from the shards. Files but the index page and the manifest
+    are named after their content for long lived caching, and every file has
+    a precompressed ``.gz`` variant.
+    """
+
+    def __init__(self, docs_dir: str, output_dir: str):
+        self.docs_dir = docs_dir
+        self.output_dir = output_dir
+        self.manifest: Dict[str, Dict[str, Any]] = {"sources": {}, "files": {}}
+        path = os.path.join(output_dir, MANIFEST)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.manifest = json.load(file)
+        self.written: List[str] = []
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.output_dir, name)
+
+    def _remove(self, name: Optional[str]) -> None:
+        for path in (self._path(name), self._path(f"{name}.gz")) if name else ():
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _write(self, name: str, data: bytes) -> None:
+        path = self._path(name)
+        if os.path.exists(path) and os.path.exists(f"{path}.gz"):
+            with open(path, "rb") as file:
+                if file.read() == data:
+                    return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+        with open(f"{path}.gz", "wb") as file:
+            file.write(gzip.compress(data, compresslevel=9, mtime=0))
+        self.written.append(name)
+
+    def _asset(self, key: str, data: bytes) -> str:
+        """
+        Write a file named after its content, and remove the one it replaces
+        """
+        directory, _, stem = key.rpartition("/")
+        stem, _, extension = stem.rpartition(".")
+        name = f"{directory}/{stem}.{_digest(data)[:12]}.{extension}"
+        self._write(name, data)
+        previous = self.manifest["files"].get(key)
+        if previous != name:
+            self._remove(previous)
+            self.manifest["files"][key] = name
+        return name
+
+    def _load(self, path: str) -> List[Dict[str, Any]]:
+        gyms = []
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    gym = ClimbGym.from_dict({"link": "", **json.loads(line)})
+                    packages = [normalize(package) for package in gym.packages]
+                    gyms.append(canonical(replace(gym, packages=packages)))
+        return gyms
+
+    def _gym_page(self, gyms: List[Dict[str, Any]], style: str) -> bytes:
+        sections = []
+        for gym in gyms:
+            rows = [
+                "<tr>"
+                + _cell(package["category"])
+                + _cell(package["title"])
+                + _cell(f"{package['currency_symbol']}{package['price']}", True)
+                + _cell(package["validity"])
+                + _cell(package["visits"], True)
+                + _cell(package["audience"])
+                + _cell("yes" if package["shareable"] else "", True)
+                + "</tr>"
+                for package in gym["packages"]
+            ]
+            link = escape(gym["link"])
+            sections.append(
+                (f'<p><a href="{link}">{link}</a></p>\n' if link else "")
+                + _table(GYM_HEADERS, rows)
+            )
+        title = ", ".join(gym["name"] for gym in gyms)
+        return PAGE.format(
+            title=escape(title), style=f"../{style}", body="\n".join(sections)
+        ).encode("utf-8")
+
+    def _stale(self, name: str, digest: str) -> bool:
+        if self.manifest["sources"].get(name) != digest:
+            return True
+        return not all(
+            key in self.manifest["files"]
+            and os.path.exists(self._path(self.manifest["files"][key]))
+            for key in (f"data/{name}.json", f"gyms/{name}.html")
+        )
+
+    def _shard(self, name: str, source: str, style: str) -> None:
+        gyms = self._load(source)
+        self._asset(f"data/{name}.json", dumps({"gyms": gyms}))
+        self._asset(f"gyms/{name}.html", self._gym_page(gyms, style))
+
+    def _index_page(
+        self, gyms: Dict[str, List[Dict[str, Any]]], style: str, data: str
+    ) -> bytes:
+        table = PriceTable(
+            ClimbGym.from_dict(gym) for records in gyms.values() for gym in records
+        )
+        links = []
+        for name, records in sorted(gyms.items()):
+            page = escape(self.manifest["files"][f"gyms/{name}.html"])
+            title = escape(", ".join(gym["name"] for gym in records))
+            links.append(f'<li><a href="{page}">{title}</a></li>')
+        sections = ["<ul>\n" + "\n".join(links) + "\n</ul>"]
+        for visits, months, audience in PATTERNS:
+            rows = [
+                "<tr>"
+                + _cell(quote.gym)
+                + _cell(quote.title)
+                + _cell(quote.passes, True)
+                + _cell(f"{quote.cost:.0f}", True)
+                + _cell(f"{quote.cost_per_visit:.2f}", True)
+                + "</tr>"
+                for quote in table.quote(visits, months, audience, top=5)
+            ]
+            sections.append(
+                f"<h2>{visits} visits a month for {months} months, {audience}</h2>\n"
+                + _table(("Gym", "Package", "Passes", "Cost", "Per visit"), rows)
+            )
+        sections.append(f'<p><a href="{escape(data)}">All prices as json</a></p>')
+        return PAGE.format(
+            title="Climbing gym prices in Hong Kong",
+            style=style,
+            body="\n".join(sections),
+        ).encode("utf-8")
+
+    def build(self, force: bool = False) -> List[str]:
+        """Rebuild the shards of the gyms whose exported file changed
+
+        Returns:
+            List[str]: files written, relative to the output directory
+        """
+        self.written = []
+        style = self._asset("assets/site.css", STYLE.encode("utf-8"))
+        style_changed = bool(self.written)
+        sources = {
+            os.path.basename(path)[: -len(".json")]: path
+            for path in sorted(glob.glob(os.path.join(self.docs_dir, "*.json")))
+            if not path.endswith("-new.json")
+        }
+        for name in set(self.manifest["sources"]) - set(sources):
+            del self.manifest["sources"][name]
+            for key in (f"data/{name}.json", f"gyms/{name}.html"):
+                self._remove(self.manifest["files"].pop(key, None))
+        for name, source in sources.items():
+            with open(source, "rb") as file:
+                digest = _digest(file.read())
+            if force or style_changed or self._stale(name, digest):
+                self._shard(name, source, style)
+                self.manifest["sources"][name] = digest
+
+        gyms = {}
+        for name in sources:
+            with open(
+                self._path(self.manifest["files"][f"data/{name}.json"]), "rb"
+            ) as file:
+                gyms[name] = json.loads(file.read())["gyms"]
+        data = self._asset(
+            "data/prices.json",
+            dumps({"gyms": [gym for name in sorted(gyms) for gym in gyms[name]]}),
+        )
+        self._write("index.html", self._index_page(gyms, style, data))
+        self._write(
+            MANIFEST,
+            json.dumps(self.manifest, indent=2, sort_keys=True).encode("utf-8"),
+        )
+        return self.written
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    settings = get_project_settings()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--docs-dir", default=settings.get("DOCS_DIR"))
+    parser.add_argument("-o", "--output-dir", default=settings.get("SITE_DIR"))
+    parser.add_argument(
+        "-f", "--force", action="store_true", help="rebuild every shard"
+    )
+    args = parser.parse_args(argv)
+
+    for name in SiteBuilder(args.docs_dir, args.output_dir).build(args.force):
+        print(name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
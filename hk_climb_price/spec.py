@@ -0,0 +1,298 @@
+"""
+Declarative extraction specs of the gym price pages
+
+A ``GymSpec`` names the blocks of a page and lists, for every package, where
+each field is read and how its text is split and normalized. ``compile()``
+turns it into a ``ParsePlan`` which evaluates each block once and walks the
+children of a block a single time, whatever the number of fields read from it.
+"""
+
+import re
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from lxml import etree
+from scrapy.http import TextResponse
+from scrapy.selector import SelectorList
+
+from hk_climb_price.helpers import breakdown_price_tag
+from hk_climb_price.items import PackageItem
+from hk_climb_price.parser import Query, Selectable, xpath
+
+Rule = Callable[[Any], Any]
+
+
+@dataclass(frozen=True)
+class Field:
+    """
+    Text of a block, normalized by a chain of rules
+
+    The text is either the first text of the ``child``-th element child of the
+    block (1-based, like ``./*[child]/text()``), or the first result of the
+    xpath ``path`` relative to the block. An ``optional`` field without text
+    resolves to None, and is left out of the tags of its package.
+    """
+
+    block: str
+    child: Optional[int] = None
+    path: Optional[str] = None
+    rules: Tuple[Rule, ...] = ()
+    optional: bool = False
+
+    def __post_init__(self):
+        if (self.child is None) == (self.path is None):
+            raise ValueError("A field is located by either child or path")
+
+    def then(self, *rules: Rule) -> "Field":
+        return replace(self, rules=self.rules + rules)
+
+    def split(
+        self, index: int, sep: Optional[str] = None, maxsplit: int = -1
+    ) -> "Field":
+        return self.then(lambda text: text.split(sep, maxsplit)[index])
+
+    def rsplit(
+        self, index: int, sep: Optional[str] = None, maxsplit: int = -1
+    ) -> "Field":
+        return self.then(lambda text: text.rsplit(sep, maxsplit)[index])
+
+    def strip(self, chars: Optional[str] = None) -> "Field":
+        return self.then(lambda text: text.strip(chars))
+
+    def replace(self, old: str, new: str = "") -> "Field":
+        return self.then(lambda text: text.replace(old, new))
+
+    def match(self, pattern: str, group: int = 1) -> "Field":
+        compiled = re.compile(pattern)
+        return self.then(lambda text: compiled.match(text)[group])
+
+
+@dataclass(frozen=True)
+class Join:
+    """
+    Concatenation of fields and literal strings
+    """
+
+    parts: Tuple[Union[Field, "Join", str], ...]
+    sep: str = " "
+
+
+Value = Union[Field, Join, str, int, None]
+
+
+@dataclass(frozen=True)
+class PackageSpec:
+    """
+    Fields of a package
+
+    Give either ``price_tag``, broken down like ``breakdown_price_tag()``
+    does, or ``price`` with an optional ``currency_symbol``.
+    """
+
+    category: str
+    title: Value
+    price_tag: Value = None
+    price: Value = None
+    currency_symbol: Value = None
+    tags: Sequence[Value] = ()
+    validity: Value = None
+
+
+@dataclass(frozen=True)
+class Block:
+    """
+    Elements selected by an xpath relative to the ``position``-th element
+    (1-based, every element by default) of the ``parent`` block, or to the
+    parsed root
+    """
+
+    path: str
+    parent: Optional[str] = None
+    position: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class GymSpec:
+    """
+    Blocks of a gym page, as xpaths relative to the parsed root or as
+    ``Block``, and the packages read from them
+
+    A parent block is declared before its children.
+    """
+
+    blocks: Mapping[str, Union[str, Block]]
+    packages: Sequence[PackageSpec] = field(default_factory=tuple)
+
+    def compile(self) -> "ParsePlan":
+        return ParsePlan(self)
+
+
+def _first_text(element: etree._Element) -> Optional[str]:
+    if element.text:
+        return element.text
+    for child in element:
+        if child.tail:
+            return child.tail
+    return None
+
+
+def _as_text(result: Any) -> Optional[str]:
+    if isinstance(result, etree._Element):
+        return _first_text(result)
+    return str(result)
+
+
+def _fields(value: Value) -> List[Field]:
+    if isinstance(value, Field):
+        return [value]
+    if isinstance(value, Join):
+        return [spec_field for part in value.parts for spec_field in _fields(part)]
+    return []
+
+
+class ParsePlan:
+    """
+    Execution plan of a gym spec
+
+    Built once per spec; ``extract()`` is called on every crawled page.
+    """
+
+    def __init__(self, spec: GymSpec):
+        self.spec = spec
+        fields = [
+            spec_field
+            for package in spec.packages
+            for value in (
+                package.title,
+                package.price_tag,
+                package.price,
+                package.currency_symbol,
+                package.validity,
+                *package.tags,
+            )
+            for spec_field in _fields(value)
+        ]
+        unknown = {spec_field.block for spec_field in fields} - set(spec.blocks)
+        if unknown:
+            raise ValueError(f"Unknown blocks: {', '.join(sorted(unknown))}")
+        self.blocks: Dict[str, Tuple[Block, Query]] = {}
+        for name, block in spec.blocks.items():
+            if isinstance(block, str):
+                block = Block(block)
+            if block.parent is not None and block.parent not in self.blocks:
+                raise ValueError(f"Block {name!r} is declared before its parent")
+            self.blocks[name] = (block, xpath(block.path))
+        # Locations read from each block, deduplicated across fields
+        self.children: Dict[str, List[int]] = {}
+        self.paths: Dict[str, List[Query]] = {}
+        for spec_field in fields:
+            if spec_field.child is not None:
+                children = self.children.setdefault(spec_field.block, [])
+                if spec_field.child not in children:
+                    children.append(spec_field.child)
+            else:
+                paths = self.paths.setdefault(spec_field.block, [])
+                query = xpath(spec_field.path)
+                if query not in paths:
+                    paths.append(query)
+
+    def _roots(self, root: Selectable) -> List[etree._Element]:
+        if isinstance(root, TextResponse):
+            root = root.selector
+        selectors = root if isinstance(root, SelectorList) else [root]
+        return [
+            selector.root
+            for selector in selectors
+            if isinstance(selector.root, etree._Element)
+        ]
+
+    def _read_block(
+        self, name: str, elements: Sequence[etree._Element]
+    ) -> Dict[Tuple[str, Any], Optional[str]]:
+        texts: Dict[Tuple[str, Any], Optional[str]] = {}
+        wanted = set(self.children.get(name, ()))
+        for element in elements:
+            if not wanted:
+                break
+            position = 0
+            for child in element.iterchildren(tag=etree.Element):
+                position += 1
+                if position in wanted:
+                    text = _first_text(child)
+                    if text is not None:
+                        texts[(name, position)] = text
+                        wanted.discard(position)
+        for query in self.paths.get(name, ()):
+            for element in elements:
+                results = query._results(element)
+                if results:
+                    texts[(name, query.expression)] = _as_text(results[0])
+                    break
+        return texts
+
+    def _resolve(self, value: Value, texts: Dict[Tuple[str, Any], Optional[str]]):
+        if isinstance(value, Join):
+            return value.sep.join(self._resolve(part, texts) for part in value.parts)
+        if not isinstance(value, Field):
+            return value
+        location = value.child if value.child is not None else value.path
+        text = texts.get((value.block, location))
+        if text is None:
+            if value.optional:
+                return None
+            raise ValueError(f"No text in block {value.block!r} at {location!r}")
+        for rule in value.rules:
+            text = rule(text)
+        return text
+
+    def _read(self, root: Selectable) -> Dict[Tuple[str, Any], Optional[str]]:
+        roots = self._roots(root)
+        selected: Dict[str, List[etree._Element]] = {}
+        texts: Dict[Tuple[str, Any], Optional[str]] = {}
+        for name, (block, query) in self.blocks.items():
+            parents = roots if block.parent is None else selected[block.parent]
+            if block.position is not None:
+                parents = parents[block.position - 1 : block.position]
+            selected[name] = elements = [
+                element for parent in parents for element in query._results(parent)
+            ]
+            texts.update(self._read_block(name, elements))
+        return texts
+
+    def _package(
+        self, package: PackageSpec, texts: Dict[Tuple[str, Any], Optional[str]]
+    ) -> PackageItem:
+        data = {
+            "title": self._resolve(package.title, texts),
+            "category": package.category,
+            "tags": [
+                tag
+                for tag in (self._resolve(tag, texts) for tag in package.tags)
+                if tag is not None
+            ],
+            "validity": self._resolve(package.validity, texts),
+        }
+        if package.price_tag is not None:
+            data.update(breakdown_price_tag(self._resolve(package.price_tag, texts)))
+        if package.price is not None:
+            data["price"] = self._resolve(package.price, texts)
+        if package.currency_symbol is not None:
+            data["currency_symbol"] = self._resolve(package.currency_symbol, texts)
+        return PackageItem(**data)
+
+    def parsers(self, root: Selectable) -> List[Callable[[], PackageItem]]:
+        """
+        One parser per package of the spec, all reading the texts pulled from
+        the page in a single pass
+        """
+        texts = self._read(root)
+        return [
+            partial(self._package, package, texts) for package in self.spec.packages
+        ]
+
+    def extract(self, root: Selectable) -> List[PackageItem]:
+        """
+        Read every package of the spec from the parsed page, or section of it
+        """
+        return [parser() for parser in self.parsers(root)]
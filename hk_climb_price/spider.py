@@ -0,0 +1,200 @@
+"""
+Base class of the gym spiders
+"""
+
+import time
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from itemadapter import is_item
+from scrapy import Spider
+from scrapy.http import Response
+from scrapy.utils.project import data_path
+from twisted.internet.defer import Deferred
+
+from hk_climb_price import offload
+from hk_climb_price.fingerprint import FingerprintStore, fingerprint
+from hk_climb_price.items import PackageItem
+from hk_climb_price.structured import StructuredExtractor
+
+
+def parser_name(parser: Callable[[], Any]) -> str:
+    """
+    Name of a parser in stats, e.g. ``JustclimbSharePassParser.parse``, or
+    ``ParsePlan._package[day-pass]`` for a package of a spec
+    """
+    func = parser.func if isinstance(parser, partial) else parser
+    owner = getattr(func, "__self__", None)
+    if owner is None:
+        name = getattr(func, "__qualname__", type(func).__name__)
+    else:
+        name = f"{type(owner).__name__}.{func.__name__}"
+    if isinstance(parser, partial) and parser.args:
+        category = getattr(parser.args[0], "category", None)
+        if category is not None:
+            name = f"{name}[{category}]"
+    return name
+
+
+class BaseGymSpider(Spider, ABC):
+    """
+    Base class of a gym price spider
+
+    ``parse_gym()`` yields the ``PackageItem`` of the gym named ``gym_name``
+    as soon as each parser returns them, see ``parse_packages()``. The item
+    pipeline assembles them into the ``ClimbGym`` record.
+
+    ``parse()`` first reads the packages from the structured data of the page
+    with ``extractors``, see ``parse_structured()``. Without any, it
+    fingerprints the part of the page read by the parsers, declared by
+    ``fingerprint_css`` or ``fingerprint_xpath``. If it matches the last run,
+    the items of the last run are re-emitted without parsing, otherwise the
+    page is parsed by ``parse_gym()``.
+
+    With ``PARSE_POOL`` set to ``thread`` or ``process``, ``parse()`` hands
+    all of this, ``parse_page()``, to a pool of ``hk_climb_price.offload`` and
+    returns a coroutine of its items, so the reactor keeps downloading while
+    pages are parsed.
+    """
+
+    gym_name: str
+    fingerprint_css: Optional[str] = None
+    fingerprint_xpath: Optional[str] = None
+    extractors: Sequence[StructuredExtractor] = ()
+    # Whether parse_page() may run in the pool of PARSE_POOL
+    offload_parse: bool = True
+
+    @abstractmethod
+    def parse_gym(self, response: Response) -> Iterable[Any]:
+        """
+        Parse gym info from the price page
+        """
+        raise NotImplementedError("parse_gym() method is not implemented")
+
+    def parse_packages(
+        self, parsers: Iterable[Callable[[], Any]]
+    ) -> Iterator[PackageItem]:
+        """Run the parsers in turn and yield their packages right away
+
+        A parser returns a package or a sequence of packages. A failing parser
+        is logged and counted in the ``gym/parser_errors`` stat, which marks
+        the gym as partial, and the next parsers still run.
+
+        Time, packages and failures of every parser are counted in the
+        ``parser/<name>/...`` stats, see ``parser_name()``.
+        """
+        stats = self.crawler.stats
+        for parser in parsers:
+            name = parser_name(parser)
+            start = time.perf_counter()
+            try:
+                result = parser()
+                items = [result] if is_item(result) else list(result)
+            except Exception:
+                self.logger.exception(f"Fail to parse packages of {self.gym_name}")
+                stats.inc_value("gym/parser_errors", spider=self)
+                stats.inc_value(f"parser/{name}/errors", spider=self)
+                continue
+            finally:
+                stats.inc_value(
+                    f"parser/{name}/seconds", time.perf_counter() - start, spider=self
+                )
+            stats.inc_value(f"parser/{name}/items", len(items), spider=self)
+            yield from items
+
+    def parse_structured(self, response: Response) -> List[PackageItem]:
+        """Packages of the first extractor finding some in the page
+
+        The count of packages read by every extractor is in the
+        ``structured/<extractor>`` stats, pages without structured packages
+        in ``structured/missing``. An extractor failing on a malformed payload
+        is logged and counted in ``structured/errors``, and the next one runs.
+        """
+        stats = self.crawler.stats
+        for extractor in self.extractors:
+            name = type(extractor).__name__
+            try:
+                packages = extractor.extract(response)
+            except Exception:
+                self.logger.exception(f"Fail to read the {name} data of {response.url}")
+                stats.inc_value("structured/errors", spider=self)
+                continue
+            if packages:
+                stats.inc_value(f"structured/{name}", len(packages), spider=self)
+                return packages
+        if self.extractors:
+            stats.inc_value("structured/missing", spider=self)
+        return []
+
+    def _fingerprint(self, response: Response) -> Optional[str]:
+        if self.fingerprint_css:
+            return fingerprint(response.css(self.fingerprint_css))
+        if self.fingerprint_xpath:
+            return fingerprint(response.xpath(self.fingerprint_xpath))
+        return None
+
+    def fingerprint_store(self) -> FingerprintStore:
+        return FingerprintStore.from_spider(
+            data_path(self.settings.get("FINGERPRINT_DIR")), self.name
+        )
+
+    def parse(self, response: Response, **kwargs) -> Any:
+        pool = self.settings.get("PARSE_POOL") if self.offload_parse else None
+        if self.settings.getbool("PROFILE_ENABLED"):
+            # Profiles cover the reactor thread only
+            pool = None
+        if pool == offload.THREAD:
+            return self._parse_offloaded(
+                offload.in_thread(self._workers(), list, self.parse_page(response))
+            )
+        if pool == offload.PROCESS:
+            return self._parse_offloaded(
+                offload.in_process(self._workers(), self, response)
+            )
+        return self.parse_page(response)
+
+    def _workers(self) -> int:
+        return self.settings.getint("PARSE_POOL_WORKERS")
+
+    async def _parse_offloaded(self, deferred: Deferred) -> List[Any]:
+        return await deferred
+
+    def parse_page(self, response: Response) -> Iterable[Any]:
+        """
+        Items of the price page, read from its structured data, from the last
+        run if its fingerprint is the same, or parsed by ``parse_gym()``
+        """
+        packages = self.parse_structured(response)
+        if packages:
+            # Reading the payload costs less than fingerprinting the page
+            yield from packages
+            return
+
+        digest = None
+        replay = self.settings.get("ARCHIVE_MODE") == "replay"
+        if self.settings.getbool("FINGERPRINT_ENABLED") and not replay:
+            digest = self._fingerprint(response)
+        if digest is None:
+            yield from self.parse_gym(response)
+            return
+
+        store = self.fingerprint_store()
+        items = store.get(response.url, digest)
+        if items is not None:
+            self.crawler.stats.inc_value("fingerprint/hit", spider=self)
+            self.logger.info(f"Same fingerprint as before: {response.url}")
+            yield from items
+            return
+
+        stats = self.crawler.stats
+        stats.inc_value("fingerprint/miss", spider=self)
+        parser_errors = stats.get_value("gym/parser_errors", 0)
+        items = []
+        for result in self.parse_gym(response):
+            if is_item(result):
+                items.append(result)
+            yield result
+        # Never replay the items of a partially parsed page
+        if stats.get_value("gym/parser_errors", 0) == parser_errors:
+            store.set(response.url, digest, items)
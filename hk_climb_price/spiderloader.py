@@ -0,0 +1,95 @@
+"""
+Spider loader importing only the spiders it is asked for
+"""
+
+import argparse
+import sys
+from typing import Dict, List, Optional, Sequence, Type
+
+from scrapy import Spider
+from scrapy.interfaces import ISpiderLoader
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.misc import load_object
+from scrapy.utils.project import get_project_settings
+from zope.interface import implementer
+
+
+@implementer(ISpiderLoader)
+class LazySpiderLoader:
+    """
+    Spider loader of the ``SPIDER_MANIFEST`` setting, spider names mapped to
+    the import path of their class
+
+    ``list()`` reads the manifest and ``load()`` imports the module of the
+    requested spider only, where Scrapy's loader imports every module of
+    ``SPIDER_MODULES`` at startup. ``find_by_request()`` needs every spider,
+    it is left to Scrapy's loader.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.manifest: Dict[str, str] = settings.getdict("SPIDER_MANIFEST")
+        self._spiders: Dict[str, Type[Spider]] = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings)
+
+    def load(self, spider_name: str) -> Type[Spider]:
+        """
+        Return the Spider class for the given spider name. If the spider
+        name is not found, raise a KeyError.
+        """
+        if spider_name not in self._spiders:
+            try:
+                path = self.manifest[spider_name]
+            except KeyError:
+                raise KeyError(f"Spider not found: {spider_name}") from None
+            spider_cls = load_object(path)
+            if getattr(spider_cls, "name", None) != spider_name:
+                raise KeyError(f"{path} is not the spider {spider_name}")
+            self._spiders[spider_name] = spider_cls
+        return self._spiders[spider_name]
+
+    def find_by_request(self, request) -> List[str]:
+        return SpiderLoader(self.settings).find_by_request(request)
+
+    def list(self) -> List[str]:
+        return list(self.manifest)
+
+
+def check(settings) -> List[str]:
+    """Compare the manifest with the spiders of ``SPIDER_MODULES``
+
+    Returns:
+        List[str]: description of every difference
+    """
+    manifest = settings.getdict("SPIDER_MANIFEST")
+    loader = SpiderLoader(settings)
+    errors = []
+    for name in sorted(set(loader.list()) | set(manifest)):
+        if name not in manifest:
+            spider_cls = loader.load(name)
+            path = f"{spider_cls.__module__}.{spider_cls.__name__}"
+            errors.append(f"{name} is missing from SPIDER_MANIFEST: '{path}'")
+        elif name not in loader.list():
+            errors.append(f"{name} is not a spider of SPIDER_MODULES")
+        elif load_object(manifest[name]) is not loader.load(name):
+            errors.append(f"{name} is not {manifest[name]}")
+    return errors
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check SPIDER_MANIFEST against the spiders of SPIDER_MODULES"
+    )
+    parser.parse_args(argv)
+
+    errors = check(get_project_settings())
+    for error in errors:
+        print(error, file=sys.stderr)
+    return int(bool(errors))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
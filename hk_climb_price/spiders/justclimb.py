@@ -2,13 +2,20 @@
 Price Parser for Just Climb web page
 """
 
-from typing import Sequence
+from typing import Iterator, Sequence
 
-from scrapy import Selector, Spider
+from scrapy import Selector
 
 from hk_climb_price.helpers import breakdown_price_tag
-from hk_climb_price.parser import BasePassParser
-from hk_climb_price.items import ClimbGym, PackageItem
+from hk_climb_price.parser import BasePassParser, DocumentIndex, css, xpath
+from hk_climb_price.items import PackageItem
+from hk_climb_price.spider import BaseGymSpider
+
+
+# Queries shared by the parsers
+TITLE_TEXT = css("h4::text")
+SHOPPAGE_TITLE = xpath(".//div[contains(@class, 'shoppage-title')]")
+NEXT_DIV = xpath("following-sibling::div[1]")
 
 
 class JustclimbDayPassParser(BasePassParser):
@@ -17,9 +24,18 @@ class JustclimbDayPassParser(BasePassParser):
     """
 
     category = "day-pass"
+    ANCHOR_ID = "day-pass"
+    FIRST_TAG = xpath("./p[1]/text()")
+    OTHER_TAGS = xpath("./p[3]/text()")
+    # The section root itself counts as a first child, as it did when the
+    # section was re-parsed as a document of its own
+    OTHER_TITLE = xpath("(self::*|.//*[1])/span/text()")
+    OTHER_PRICE_TAG = xpath(".//*[2]/span/text()")
+    OTHER_TAGS_TEXT = xpath(".//*[3]/span/text()")
 
     def parse(self) -> Sequence[PackageItem]:
         self.base_title = self._parse_base_title()
+        self.tags = self._parse_tags()
         return [
             self._parse_adult_item(),
             self._parse_student_item(),
@@ -28,14 +44,14 @@ class JustclimbDayPassParser(BasePassParser):
 
     @property
     def _title_selector(self) -> Selector:
-        return self.selector.xpath("//div[@id='day-pass']")
+        return self.index.by_id(self.ANCHOR_ID, tag="div")
 
     @property
     def _detail_selector(self) -> Selector:
-        return self.selector.xpath("//div[@id='day-pass']/following-sibling::div[1]")
+        return NEXT_DIV(self._title_selector)
 
     def _parse_base_title(self) -> str:
-        return self._title_selector.css("h4::text").get()
+        return TITLE_TEXT(self._title_selector).get()
 
     def _parse_items(self) -> Sequence[PackageItem]:
         return [
@@ -45,25 +61,23 @@ class JustclimbDayPassParser(BasePassParser):
         ]
 
     def _parse_tags(self) -> Sequence[str]:
-        shoppage_selector = self._detail_selector.xpath(
-            ".//div[contains(@class, 'shoppage-title')]"
-        )
+        shoppage_selector = SHOPPAGE_TITLE(self._detail_selector)
 
         tags = [
-            shoppage_selector.xpath("./p[1]/text()").get(),
-            *shoppage_selector.xpath("./p[3]/text()").getall(),
+            self.FIRST_TAG(shoppage_selector).get(),
+            *self.OTHER_TAGS(shoppage_selector).getall(),
         ]
         return [tag.strip() for tag in tags]
 
     def _parse_price_tag(self, index: int) -> str:
-        xpath = f".//div[contains(@class, 'shoppage-title')]/*[{index+1}]/text()"
-        return self._detail_selector.xpath(xpath).get()
+        query = xpath(f".//div[contains(@class, 'shoppage-title')]/*[{index+1}]/text()")
+        return query(self._detail_selector).get()
 
     def _parse_adult_item(self) -> PackageItem:
         return PackageItem(
             title=self.base_title + " Adult",
             category=self.category,
-            tags=self._parse_tags(),
+            tags=self.tags,
             **breakdown_price_tag(self._parse_price_tag(index=1)),
             validity="一日",
         )
@@ -72,20 +86,17 @@ class JustclimbDayPassParser(BasePassParser):
         return PackageItem(
             title=self.base_title + " Student",
             category=self.category,
-            tags=self._parse_tags(),
+            tags=self.tags,
             **breakdown_price_tag(self._parse_price_tag(index=2).split()[1]),
             validity="一日",
         )
 
     def _parse_other_item(self) -> PackageItem:
-        shoppage_div_text = self._detail_selector.xpath(
-            ".//div[contains(@class, 'shoppage-title')]"
-        ).getall()[1]
-        shoppage_div = Selector(text=shoppage_div_text)
+        shoppage_div = SHOPPAGE_TITLE(self._detail_selector)[1]
         sep = "｜"
-        title = shoppage_div.xpath(".//*[1]/span/text()").get()
-        price_tag = shoppage_div.xpath(".//*[2]/span/text()").get()
-        tags_str = shoppage_div.xpath(".//*[3]/span/text()").get()
+        title = self.OTHER_TITLE(shoppage_div).get()
+        price_tag = self.OTHER_PRICE_TAG(shoppage_div).get()
+        tags_str = self.OTHER_TAGS_TEXT(shoppage_div).get()
         return PackageItem(
             title=title.split(sep)[0],
             category="class",
@@ -99,14 +110,18 @@ class JustclimbSharePassParser(BasePassParser):
     Share pass info parser
     """
 
+    ANCHOR_ID = "share-climb"
+    ITEMS = css("div.grve-text")
+
     def parse(self) -> Sequence[PackageItem]:
+        base_title = self._parse_base_title()
         packages = [
             self.ItemParser(
                 selector=item,
-                base_title=self._parse_base_title(),
+                base_title=base_title,
                 category="share-pass",
             ).parse()
-            for item in self._detail_selector.css("div.grve-text")
+            for item in self.ITEMS(self._detail_selector)
         ]
         return [package for package in packages if package.price]
 
@@ -115,6 +130,10 @@ class JustclimbSharePassParser(BasePassParser):
         Share pass item info parser
         """
 
+        TITLE = css("div > *:nth-child(1)::text")
+        PRICE_TAG = css("div > *:nth-child(2)::text")
+        NOTES = xpath(".//p[2]/text()")
+
         def __init__(self, selector: Selector, base_title: str, category: str):
             self.selector = selector
             self.base_title = base_title
@@ -126,6 +145,7 @@ class JustclimbSharePassParser(BasePassParser):
             Returns:
                 PackageItem: the share pass item info
             """
+            self.notes = self.NOTES(self.selector).getall()
             return PackageItem(
                 title=self._parse_title(),
                 category=self.category,
@@ -135,37 +155,31 @@ class JustclimbSharePassParser(BasePassParser):
             )
 
         def _parse_title(self) -> str:
-            return (
-                self.base_title
-                + " "
-                + self.selector.css("div > *:nth-child(1)::text").get()
-            )
+            return self.base_title + " " + self.TITLE(self.selector).get()
 
         def _parse_tags(self) -> Sequence[str]:
-            temp = self.selector.xpath(".//p[2]/text()").getall()
-            if not temp:
+            if not self.notes:
                 return []
-            return [temp[0].strip()]
+            return [self.notes[0].strip()]
 
         def _parse_validity(self) -> str:
-            temp = self.selector.xpath(".//p[2]/text()").getall()
-            if not temp:
+            if not self.notes:
                 return None
-            return temp[1].strip().replace("有效期", "")
+            return self.notes[1].strip().replace("有效期", "")
 
         def _parse_price_tag(self) -> str:
-            return self.selector.css("div > *:nth-child(2)::text").get()
+            return self.PRICE_TAG(self.selector).get()
 
     @property
     def _title_selector(self) -> Selector:
-        return self.selector.xpath("//div[@id='share-climb']")
+        return self.index.by_id(self.ANCHOR_ID, tag="div")
 
     @property
     def _detail_selector(self) -> Selector:
-        return self.selector.xpath("//div[@id='share-climb']/following-sibling::div[1]")
+        return NEXT_DIV(self._title_selector)
 
     def _parse_base_title(self) -> str:
-        return self._title_selector.css("h4::text").get()
+        return TITLE_TEXT(self._title_selector).get()
 
 
 class JustclimbMonthPassParser(BasePassParser):
@@ -174,9 +188,12 @@ class JustclimbMonthPassParser(BasePassParser):
     """
 
     category = "month-pass"
+    ANCHOR_ID = "monthly-pass"
+    TAG = xpath(".//div[contains(@class, 'shoppage-title')]/p[1]/span/text()")
 
     def parse(self) -> Sequence[PackageItem]:
         self.base_title = self._parse_base_title()
+        self.tags = self._parse_tags()
         return [
             self._parse_adult_item(),
             self._parse_student_item(),
@@ -184,30 +201,29 @@ class JustclimbMonthPassParser(BasePassParser):
 
     @property
     def _title_selector(self) -> Selector:
-        return self.selector.xpath("//div[@id='monthly-pass']")
+        return self.index.by_id(self.ANCHOR_ID, tag="div")
 
     @property
     def _detail_selector(self) -> Selector:
-        return self.selector.xpath(
-            "//div[@id='monthly-pass']/following-sibling::div[1]"
-        )
+        return NEXT_DIV(self._title_selector)
 
     def _parse_base_title(self) -> str:
-        return self._title_selector.css("h4::text").get()
+        return TITLE_TEXT(self._title_selector).get()
 
     def _parse_tags(self) -> str:
-        xpath = ".//div[contains(@class, 'shoppage-title')]/p[1]/span/text()"
-        return {self._detail_selector.xpath(xpath).get()}
+        return {self.TAG(self._detail_selector).get()}
 
     def _parse_price_tag(self, index: int) -> str:
-        xpath = f".//div[contains(@class, 'shoppage-title')]/*[{index+1}]/span/text()"
-        return self._detail_selector.xpath(xpath).get()
+        query = xpath(
+            f".//div[contains(@class, 'shoppage-title')]/*[{index+1}]/span/text()"
+        )
+        return query(self._detail_selector).get()
 
     def _parse_adult_item(self) -> PackageItem:
         return PackageItem(
             title=self.base_title + " Adult",
             category=self.category,
-            tags=self._parse_tags(),
+            tags=self.tags,
             **breakdown_price_tag(self._parse_price_tag(index=1)),
             validity="一個月",
         )
@@ -216,7 +232,7 @@ class JustclimbMonthPassParser(BasePassParser):
         return PackageItem(
             title=self.base_title + " Student",
             category=self.category,
-            tags=self._parse_tags(),
+            tags=self.tags,
             **breakdown_price_tag(self._parse_price_tag(index=2).split()[1]),
             validity="一個月",
         )
@@ -227,10 +243,11 @@ class JustclimbMembershipParser(BasePassParser):
     Membership package info parser
     """
 
+    ANCHOR_ID = "just-climber"
+    BASE_TITLE = xpath(".//h4/text()")
+
     def parse(self) -> Sequence[PackageItem]:
-        item_selector = self._detail_selector.xpath(
-            ".//div[contains(@class, 'shoppage-title')]"
-        )
+        item_selector = SHOPPAGE_TITLE(self._detail_selector)
         item = self.ItemParser(selector=item_selector, category="membership").parse()
         # item.title = self._parse_title()
         return [item]
@@ -240,6 +257,10 @@ class JustclimbMembershipParser(BasePassParser):
         Jcer package item info parser
         """
 
+        PRICE_TEXT = xpath("./*[1]/text()")
+        TITLE = xpath("./*[2]/text()")
+        TAGS = xpath("./*[4]/text()")
+
         def __init__(self, selector: Selector, category: str):
             self.selector = selector
             self.category = category
@@ -259,65 +280,55 @@ class JustclimbMembershipParser(BasePassParser):
             )
 
         def _parse_title(self) -> str:
-            return self.selector.xpath("./*[2]/text()").get()
+            return self.TITLE(self.selector).get()
 
         def _parse_tags(self) -> Sequence[str]:
-            tags = self.selector.xpath("./*[4]/text()").getall()
+            tags = self.TAGS(self.selector).getall()
             return [tag.strip() for tag in tags]
 
         def _parse_validity(self) -> str:
             return self._parse_title().replace("合約", "")
 
         def _parse_price_tag(self) -> str:
-            return "$" + self.selector.xpath("./*[1]/text()").get().split("$")[1]
+            return "$" + self.PRICE_TEXT(self.selector).get().split("$")[1]
 
     @property
     def _title_selector(self) -> Selector:
-        return self.selector.xpath("//div[@id='just-climber']")
+        return self.index.by_id(self.ANCHOR_ID, tag="div")
 
     @property
     def _detail_selector(self) -> Selector:
-        return self.selector.xpath(
-            "//div[@id='just-climber']/following-sibling::div[1]"
-        )
+        return NEXT_DIV(self._title_selector)
 
     def _parse_title(self) -> str:
-        return self._title_selector.xpath(".//h4/text()").get()
+        return self.BASE_TITLE(self._title_selector).get()
 
 
-class JustclimbPriceSpider(Spider):
+class JustclimbPriceSpider(BaseGymSpider):
     """
     Web spider which crawls passes, package info from JustClimb web page
     """
 
     name = "justclimb"
+    gym_name = "Just Climb"
     start_urls = ["https://justclimb.hk/price/"]
-
-    def _select_day_passes(self, response: Selector) -> Sequence[PackageItem]:
-        parser = JustclimbDayPassParser(selector=response)
-        return parser.parse()
-
-    def _select_share_passes(self, response: Selector) -> Sequence[PackageItem]:
-        parser = JustclimbSharePassParser(selector=response)
-        return parser.parse()
-
-    def _select_month_passes(self, response: Selector) -> Sequence[PackageItem]:
-        parser = JustclimbMonthPassParser(selector=response)
-        return parser.parse()
-
-    def _select_membership_price(self, response: Selector) -> Sequence[PackageItem]:
-        parser = JustclimbMembershipParser(selector=response)
-        return parser.parse()
-
-    def parse(self, response: Selector) -> ClimbGym:  # pylint: disable=arguments-differ
-        justclimb = ClimbGym(
-            name="Just Climb",
-            link=self.start_urls[0],
-            packages=[
-                *self._select_day_passes(response),
-                *self._select_share_passes(response),
-                *self._select_month_passes(response),
-                *self._select_membership_price(response),
-            ],
+    fingerprint_xpath = (
+        "//div[@id='day-pass' or @id='share-climb' or @id='monthly-pass'"
+        " or @id='just-climber']/following-sibling::div[1]"
+        " | //div[@id='day-pass' or @id='share-climb' or @id='monthly-pass'"
+        " or @id='just-climber']"
+    )
+
+    PARSERS = (
+        JustclimbDayPassParser,
+        JustclimbSharePassParser,
+        JustclimbMonthPassParser,
+        JustclimbMembershipParser,
+    )
+
+    def parse_gym(self, response: Selector) -> Iterator[PackageItem]:
+        index = DocumentIndex(response)
+        yield from self.parse_packages(
+            parser_cls(selector=response, index=index).parse
+            for parser_cls in self.PARSERS
         )
-        yield justclimb
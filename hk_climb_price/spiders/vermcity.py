@@ -1,135 +1,117 @@
 """
 Price Crawler for Just Climb web page
 """
-import logging
 import re
-from typing import Dict, Sequence
+from typing import Iterator
 
-from scrapy import Selector, Spider
+from scrapy import Selector
 
-from hk_climb_price.helpers import breakdown_price_tag, process_text
-from hk_climb_price.items import ClimbGym, PackageItem
+from hk_climb_price.helpers import process_text
+from hk_climb_price.items import PackageItem
+from hk_climb_price.parser import DocumentIndex
+from hk_climb_price.spec import Field, GymSpec, Join, PackageSpec
+from hk_climb_price.spider import BaseGymSpider
+from hk_climb_price.structured import JsonLdExtractor
 
 
 def _remove_parentheses(string: str) -> str:
     return re.sub(r"[\(\)]", "", string)
 
 
-class JustclimbPriceSpider(Spider):
+def _share_pass(child: int) -> PackageSpec:
+    # "<name> (<validity>) <price tag>"
+    text = Field("membership", child=child)
+    return PackageSpec(
+        category="share-pass",
+        title=text.rsplit(0, maxsplit=2),
+        validity=text.rsplit(1, maxsplit=2).then(_remove_parentheses).replace("只限"),
+        price_tag=text.rsplit(2, maxsplit=2),
+    )
+
+
+def _membership(child: int) -> PackageSpec:
+    # "<validity> $<price>"
+    text = Field("membership", child=child)
+    validity = text.split(0, "$").then(process_text)
+    return PackageSpec(
+        category="membership",
+        title=Join((Field("membership", child=1), validity)),
+        validity=validity,
+        price_tag=Join(("$", text.split(1, "$")), sep=""),
+    )
+
+
+DAY_PASS = Field("day_pass", child=2)
+CLIP_N_CLIMB_TITLE = Field("clip_n_climb", child=1)
+SECTION_PASS = Field("clip_n_climb", child=2)
+TEN_PASS = Field("clip_n_climb", child=3)
+CLIP_N_CLIMB_TAGS = (Field("clip_n_climb", child=5, optional=True),)
+
+SPEC = GymSpec(
+    # Relative to the main content section
+    blocks={
+        "day_pass": "./div/div[3]/div[4]//div[contains(@class, 'block-content')]",
+        "clip_n_climb": ("./div/div[3]/div[2]//div[contains(@class, 'block-content')]"),
+        "membership": (
+            "./div/div[4]/div/div[1]//div[contains(@class, 'block-content')][1]"
+        ),
+    },
+    packages=(
+        PackageSpec(
+            category="day-pass",
+            title=Join((Field("day_pass", child=1), DAY_PASS.split(0))),
+            tags=tuple(
+                Field("day_pass", child=child, optional=True) for child in range(3, 7)
+            ),
+            price_tag=DAY_PASS.split(1),
+        ),
+        PackageSpec(
+            category="section-pass",
+            title=Join((CLIP_N_CLIMB_TITLE, SECTION_PASS.then(process_text))),
+            tags=CLIP_N_CLIMB_TAGS,
+            price_tag=SECTION_PASS.split(1, " "),
+        ),
+        PackageSpec(
+            category="share-pass",
+            title=Join((CLIP_N_CLIMB_TITLE, TEN_PASS.split(0, " "))),
+            tags=CLIP_N_CLIMB_TAGS,
+            price_tag=TEN_PASS.split(1, " "),
+            validity=TEN_PASS.split(2, " ").then(_remove_parentheses),
+        ),
+        _share_pass(6),
+        _share_pass(7),
+        *(_membership(child) for child in range(2, 6)),
+    ),
+)
+
+
+# Category of the packages of the structured data, by title
+CATEGORIES = (
+    (r"節", "section-pass"),
+    (r"會籍|membership", "membership"),
+    (r"日票|\bday\b", "day-pass"),
+    (r"次|share|pass", "share-pass"),
+)
+
+
+class JustclimbPriceSpider(BaseGymSpider):
     """
     Web spider which crawls passes, package info from Verm City web page
     """
 
     name = "vermcity"
+    gym_name = "Verm City"
     start_urls = ["https://www.vermcity.com/pricing-chi"]
+    fingerprint_xpath = ".//section[@class='Main-content']"
+    # A Squarespace page
+    extractors = (JsonLdExtractor(CATEGORIES),)
+
+    PLAN = SPEC.compile()
+
+    def _select_main_content(self, response: Selector) -> Selector:
+        index = DocumentIndex(response)
+        return index.by_class("Main-content", tag="section", exact=True)
 
-    def _select_day_pass(self, response: Selector) -> PackageItem:
-        block = response.xpath(
-            ".//section[@class='Main-content']/div/div[3]/div[4]"
-            "//div[contains(@class, 'block-content')]"
-        )
-        day_pass = {
-            "title": block.xpath("./*[1]/text()").get()
-            + " "
-            + block.xpath("./*[2]/text()").get().split()[0],
-            "category": "day-pass",
-            "tags": [
-                block.xpath("./*[3]/text()").get(),
-                block.xpath("./*[4]/text()").get(),
-                block.xpath("./*[5]/text()").get(),
-                block.xpath("./*[6]/text()").get(),
-            ],
-            **breakdown_price_tag(block.xpath("./*[2]/text()").get().split()[1]),
-        }
-        return PackageItem(**day_pass)
-
-    def _select_clip_n_climb_passes(self, response: Selector) -> Sequence[PackageItem]:
-        block = response.xpath(
-            ".//section[@class='Main-content']/div/div[3]/div[2]"
-            "//div[contains(@class, 'block-content')]"
-        )
-        section_pass_text = block.xpath("./*[2]/text()").get()
-        ten_pass_text = block.xpath("./*[3]/text()").get()
-        base_title = block.xpath("./*[1]/text()").get()
-        tags = [block.xpath("./*[5]/text()").get()]
-        items = [
-            {
-                "title": base_title + " " + process_text(section_pass_text),
-                "category": "section-pass",
-                "tags": tags,
-                **breakdown_price_tag(section_pass_text.split(" ")[1]),
-            },
-            {
-                "title": base_title + " " + ten_pass_text.split(" ")[0],
-                "category": "share-pass",
-                "tags": tags,
-                **breakdown_price_tag(ten_pass_text.split(" ")[1]),
-                "validity": _remove_parentheses(ten_pass_text.split(" ")[2]),
-            },
-        ]
-
-        return [PackageItem(**item) for item in items]
-
-    def _share_pass_price_item(self, string: str) -> Sequence[PackageItem]:
-        name, validity, price_tag = string.rsplit(maxsplit=2)
-        return {
-            "title": name,
-            "validity": _remove_parentheses(validity).replace("只限", ""),
-            **breakdown_price_tag(price_tag),
-        }
-
-    def _select_share_passes(self, response: Selector) -> Sequence[PackageItem]:
-        block = response.xpath(
-            ".//section[@class='Main-content']/div/div[4]/div/div[1]"
-            "//div[contains(@class, 'block-content')][1]"
-        )
-        items = [
-            self._share_pass_price_item(block.xpath("./*[6]/text()").get()),
-            self._share_pass_price_item(block.xpath("./*[7]/text()").get()),
-        ]
-        for item in items:
-            item["title"] = item["title"]
-            item["category"] = "share-pass"
-        return [PackageItem(**item) for item in items]
-
-    def _membership_price_item(self, string: str) -> PackageItem:
-        title, price_tag = string.split("$")
-        return {
-            "title": process_text(title),
-            **breakdown_price_tag("$" + price_tag),
-            "validity": process_text(title),
-        }
-
-    def _select_membership_passes(
-        self,
-        response: Selector,
-    ) -> PackageItem:
-        block = response.xpath(
-            ".//section[@class='Main-content']/div/div[4]/div/div[1]"
-            "//div[contains(@class, 'block-content')][1]"
-        )
-        base_title = block.xpath("./*[1]/text()").get()
-        category = "membership"
-        items = [
-            self._membership_price_item(block.xpath("./*[2]/text()").get()),
-            self._membership_price_item(block.xpath("./*[3]/text()").get()),
-            self._membership_price_item(block.xpath("./*[4]/text()").get()),
-            self._membership_price_item(block.xpath("./*[5]/text()").get()),
-        ]
-        for item in items:
-            item["title"] = base_title + " " + item["title"]
-            item["category"] = "membership"
-        return [PackageItem(**item) for item in items]
-
-    def parse(self, response: Selector) -> ClimbGym:  # pylint: disable=arguments-differ
-        vermcity = ClimbGym(
-            name="Verm City",
-            link=self.start_urls[0],
-            packages=[
-                self._select_day_pass(response),
-                *self._select_clip_n_climb_passes(response),
-                *self._select_share_passes(response),
-                *self._select_membership_passes(response),
-            ],
-        )
-        yield vermcity
+    def parse_gym(self, response: Selector) -> Iterator[PackageItem]:
+        content = self._select_main_content(response)
+        yield from self.parse_packages(self.PLAN.parsers(content))
@@ -0,0 +1,200 @@
+"""
+Packages read from the structured data site builders embed in their pages
+"""
+
+import json
+import math
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+from scrapy.http import TextResponse
+
+from hk_climb_price.items import PackageItem
+
+CURRENCY_SYMBOLS = {"HKD": "$", "USD": "US$", "CNY": "¥", "EUR": "€", "GBP": "£"}
+
+# Units of schema.org QuantitativeValue (UN/CEFACT codes) and of Wix durations
+UNITS = {
+    "DAY": "day",
+    "WEE": "week",
+    "WEEK": "week",
+    "MON": "month",
+    "MONTH": "month",
+    "ANN": "year",
+    "YEAR": "year",
+}
+
+
+def _price(value: Any) -> Optional[int]:
+    try:
+        price = float(str(value).replace(",", ""))
+    except ValueError:
+        return None
+    # "NaN" and "Infinity" are floats too
+    return int(price) if math.isfinite(price) else None
+
+
+def _duration(count: Any, unit: Any) -> Optional[str]:
+    name = UNITS.get(str(unit).upper())
+    if name is None or not count:
+        return None
+    return f"{count} {name}{'s' if str(count) != '1' else ''}"
+
+
+def _text(value: Any) -> str:
+    return " ".join(str(value).split()) if value else ""
+
+
+def _dict(value: Any) -> Dict[str, Any]:
+    return value if isinstance(value, dict) else {}
+
+
+def _types(node: Dict[str, Any]) -> Tuple[str, ...]:
+    # JSON-LD allows several types, e.g. ["Product", "Service"]
+    kind = node.get("@type")
+    return tuple(kind) if isinstance(kind, list) else (kind,)
+
+
+class StructuredExtractor(ABC):
+    """
+    Read the packages of a page from the JSON a site builder embeds in it
+
+    ``scripts`` selects the script elements holding the payload. Every object
+    of the payload is offered to ``package()``, objects it maps are not looked
+    into. Packages take the category of the first of ``categories``, pairs of
+    a pattern and a category, matching their title; packages matching none
+    are left out.
+    """
+
+    scripts: str
+
+    def __init__(self, categories: Sequence[Tuple[str, str]]):
+        self.categories: Tuple[Tuple[Pattern, str], ...] = tuple(
+            (re.compile(pattern, re.IGNORECASE), category)
+            for pattern, category in categories
+        )
+
+    def payloads(self, response: TextResponse) -> List[str]:
+        return response.css(self.scripts).getall()
+
+    def category(self, title: str) -> Optional[str]:
+        for pattern, category in self.categories:
+            if pattern.search(title):
+                return category
+        return None
+
+    @abstractmethod
+    def package(self, node: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], ...]]:
+        """
+        Fields of the packages of an object of the payload, without category,
+        or None if the object is not a package
+        """
+        raise NotImplementedError("package() method is not implemented")
+
+    def _packages(self, node: Any) -> Iterator[Dict[str, Any]]:
+        if isinstance(node, list):
+            for child in node:
+                yield from self._packages(child)
+        elif isinstance(node, dict):
+            packages = self.package(node)
+            if packages is not None:
+                yield from packages
+                return
+            for child in node.values():
+                yield from self._packages(child)
+
+    def extract(self, response: TextResponse) -> List[PackageItem]:
+        """Packages of the payload of the page
+
+        Returns:
+            List[PackageItem]: the packages, empty if the page has no payload
+            or no package in it
+        """
+        packages = []
+        for payload in self.payloads(response):
+            try:
+                data = json.loads(payload)
+            except ValueError:
+                continue
+            for fields in self._packages(data):
+                category = self.category(fields["title"])
+                if category is not None and fields.get("price") is not None:
+                    packages.append(PackageItem(category=category, **fields))
+        return packages
+
+
+class JsonLdExtractor(StructuredExtractor):
+    """
+    schema.org ``Offer`` of the JSON-LD of the page, as Squarespace and Wix
+    publish their products
+    """
+
+    scripts = "script[type='application/ld+json']::text"
+
+    def _offer(self, offer: Dict[str, Any], title: str) -> Dict[str, Any]:
+        duration = _dict(offer.get("eligibleDuration"))
+        currency = offer.get("priceCurrency", "HKD")
+        return {
+            "title": " ".join(filter(None, (title, _text(offer.get("name"))))),
+            "currency_symbol": CURRENCY_SYMBOLS.get(currency, currency),
+            "price": _price(offer.get("price")),
+            "validity": _duration(duration.get("value"), duration.get("unitCode")),
+            "tags": (_text(offer["description"]),) if offer.get("description") else (),
+        }
+
+    def package(self, node: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], ...]]:
+        kinds = _types(node)
+        if "Offer" in kinds:
+            return (self._offer(node, ""),)
+        if "Product" in kinds and node.get("offers"):
+            offers = node["offers"]
+            if isinstance(offers, dict):
+                # An AggregateOffer lists its offers, if it lists any, an
+                # aggregate price range is not the price of a package
+                offers = offers.get("offers") or [offers]
+            if not isinstance(offers, list):
+                offers = [offers]
+            title = _text(node.get("name"))
+            return tuple(
+                self._offer(offer, title) for offer in offers if isinstance(offer, dict)
+            )
+        return None
+
+
+class WixPricingPlansExtractor(StructuredExtractor):
+    """
+    Plans of the Wix Pricing Plans app, in the warmup data of the page
+    """
+
+    scripts = "script#wix-warmup-data::text"
+
+    def package(self, node: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], ...]]:
+        pricing = node.get("pricing")
+        if not isinstance(pricing, dict) or not isinstance(pricing.get("price"), dict):
+            return None
+        price = pricing["price"]
+        currency = price.get("currency", "HKD")
+        validity = None
+        if pricing.get("singlePaymentForDuration"):
+            duration = _dict(pricing["singlePaymentForDuration"])
+            validity = _duration(duration.get("count"), duration.get("unit"))
+        elif pricing.get("subscription"):
+            subscription = _dict(pricing["subscription"])
+            cycle = _dict(subscription.get("cycleDuration"))
+            validity = _duration(
+                (subscription.get("cycleCount") or 1) * (cycle.get("count") or 1),
+                cycle.get("unit"),
+            )
+            if str(cycle.get("unit")).upper() == "MONTH":
+                validity = f"{validity}, monthly"
+        perks = _dict(node.get("perks")).get("values") or ()
+        return (
+            {
+                "title": _text(node.get("name")),
+                "currency_symbol": CURRENCY_SYMBOLS.get(currency, currency),
+                "price": _price(price.get("value")),
+                "validity": validity,
+                "tags": tuple(_text(perk) for perk in perks if perk),
+            },
+        )
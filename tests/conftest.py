@@ -0,0 +1,27 @@
+import os
+from typing import Callable
+
+import pytest
+from scrapy.http import HtmlResponse
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture_path(name: str) -> str:
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture
+def page() -> Callable[..., HtmlResponse]:
+    """
+    Response of a fixture page, served at the url of the given spider
+    """
+
+    def load(name: str, url: str, replace: tuple = ()) -> HtmlResponse:
+        with open(fixture_path(name), encoding="utf-8") as file:
+            html = file.read()
+        for old, new in replace:
+            html = html.replace(old, new)
+        return HtmlResponse(url=url, body=html.encode("utf-8"), encoding="utf-8")
+
+    return load
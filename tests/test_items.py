@@ -0,0 +1,47 @@
+import pickle
+from dataclasses import FrozenInstanceError, fields
+
+import pytest
+
+from hk_climb_price.items import ClimbGym, PackageItem
+
+PACKAGE = PackageItem(
+    title="10 Pass - Student",
+    category="multi-pass",
+    tags=("Valid for 3 months",),
+    currency_symbol="HK$",
+    price=1200,
+    validity="3 months",
+    duration_days=90,
+    audience="student",
+    visits=10,
+    shareable=True,
+    per_month=True,
+)
+GYM = ClimbGym(
+    name="Attic V", link="https://gym.test/", packages=[PACKAGE], partial=True
+)
+
+
+def test_from_dict_sets_every_field():
+    # from_dict() fills the slots one by one, none may be left out
+    assert all(
+        getattr(PACKAGE, spec.name) != spec.default for spec in fields(PackageItem)
+    )
+    assert PackageItem.from_dict(PACKAGE.to_dict()) == PACKAGE
+    assert ClimbGym.from_dict(GYM.to_dict()) == GYM
+
+
+def test_items_are_frozen_and_picklable():
+    gym = ClimbGym.from_dict(GYM.to_dict())
+    assert type(gym) is ClimbGym and type(gym.packages[0]) is PackageItem
+    assert pickle.loads(pickle.dumps(gym)) == gym
+    assert hash(gym.packages[0]) == hash(PACKAGE)
+    with pytest.raises(FrozenInstanceError):
+        gym.packages[0].price = 0
+
+
+def test_missing_tags_of_old_snapshots_are_left_out():
+    data = {**PACKAGE.to_dict(), "tags": [None, "Valid for 3 months"]}
+    assert PackageItem.from_dict(data).tags == ("Valid for 3 months",)
+    assert PackageItem(title="t", category="day-pass", tags=[None]).tags == ()
@@ -0,0 +1,112 @@
+import pytest
+
+from hk_climb_price import normalize
+from hk_climb_price.compare import PriceTable
+from hk_climb_price.items import ClimbGym, PackageItem
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("一日", 1),
+        ("1 day", 1),
+        ("兩星期", 14),
+        ("一個月", 30),
+        ("3個月", 90),
+        ("3 Months", 90),
+        ("十二個月", 360),
+        ("1年", 365),
+        ("無限次", None),
+        (None, None),
+    ],
+)
+def test_duration_days(text, expected):
+    assert normalize.duration_days(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("全日攀 Adult", "adult"),
+        ("全月攀 Student", "student"),
+        ("10 Pass - Student under 18", "child"),
+        ("10 Pass - Student 18+", "student"),
+        ("10 Pass - Under 18", "child"),
+        ("小童 Clip n Climb", "child"),
+        ("Kids Class", "child"),
+        ("成人月票", "adult"),
+        ("10 Pass", None),
+    ],
+)
+def test_audience(text, expected):
+    assert normalize.audience(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("10 Pass", 10),
+        ("5 Share Pass", 5),
+        ("共享攀 10次套票", 10),
+        ("Clip n Climb 1節", 1),
+        ("全日攀 Adult", None),
+    ],
+)
+def test_visits(text, expected):
+    assert normalize.visits(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Non-transferable share pass", False),
+        ("只限本人使用", False),
+        ("5 Share Pass", True),
+        ("共享攀", True),
+        ("10 Pass", None),
+    ],
+)
+def test_shareable(text, expected):
+    assert normalize.shareable(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [("12個月合約", True), ("自動繳費", True), ("Paid monthly", True), ("年費", None)],
+)
+def test_per_month(text, expected):
+    assert normalize.per_month(text) == expected
+
+
+@pytest.mark.parametrize(
+    "title, tags, expected",
+    [
+        ("10 Pass", ("Student under 18",), "child"),
+        ("10 Pass - Adult", ("學生優惠",), "adult"),
+        ("10 Pass", ("無須預約",), None),
+    ],
+)
+def test_audience_of_package_title_then_tags(title, tags, expected):
+    item = PackageItem(title=title, category="multi-pass", tags=tags, price=1000)
+    assert normalize.normalize(item).audience == expected
+
+
+def test_under_18_passes_are_quoted_for_children_only():
+    gym = ClimbGym(
+        name="Attic V",
+        link="",
+        packages=[
+            normalize.normalize(
+                PackageItem(title=title, category="multi-pass", price=price)
+            )
+            for title, price in (
+                ("10 Pass - Student 18+", 1200),
+                ("10 Pass - Student under 18", 1000),
+            )
+        ],
+    )
+    table = PriceTable([gym])
+    assert [quote.title for quote in table.quote(8, 6, "student")] == [
+        "10 Pass - Student 18+"
+    ]
+    assert table.quote(8, 6, "child")[0].title == "10 Pass - Student under 18"
@@ -0,0 +1,114 @@
+from concurrent.futures import Future
+
+import pytest
+from scrapy.crawler import Crawler
+from scrapy.http import HtmlResponse, Response
+from scrapy.utils.project import get_project_settings
+from twisted.internet import defer
+
+from hk_climb_price import ocr
+from tests.conftest import fixture_path
+
+pytest.importorskip("PIL")
+
+# Text of every fixture image, as Tesseract would read it
+TEXTS = {
+    "prices_1.png": "Day Pass\nAdult $150\nStudent $120 (1 day)\n",
+    "prices_2.png": "10 Pass $1,300 (3 months) Non-transferable\n",
+    "prices_3.png": "Shoes Rental $30\n",
+}
+
+
+class ImageGymSpider(ocr.ImagePriceSpider):
+    name = "imagegym"
+    gym_name = "Image Gym"
+    start_urls = ["https://gym.test/prices"]
+    price_list = ocr.PriceListText(
+        (("day", "day-pass"), ("pass", "multi-pass"), ("rental", "eq-rental"))
+    )
+
+
+class Immediate:
+    """
+    Executor running the OCR in the test process, as it is submitted
+    """
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+@pytest.fixture
+def spider(tmp_path, monkeypatch):
+    images = {}
+    for name, text in TEXTS.items():
+        with open(fixture_path(f"ocr/{name}"), "rb") as file:
+            images[file.read()] = text
+    recognized = []
+
+    def recognize(data, languages, config):
+        recognized.append(images[data])
+        return images[data]
+
+    monkeypatch.setattr(ocr, "recognize", recognize)
+    monkeypatch.setattr(ocr, "executor", lambda workers: Immediate())
+    monkeypatch.setattr(
+        ocr, "deferred_from_future", lambda future: defer.succeed(future.result())
+    )
+    settings = get_project_settings()
+    settings.set("OCR_CACHE", str(tmp_path / "ocr.json"))
+    spider = ImageGymSpider.from_crawler(Crawler(ImageGymSpider, settings))
+    spider.recognized = recognized
+    return spider
+
+
+def _requests(spider, url, images):
+    html = "".join(f"<img src='{image}'>" for image in images)
+    response = HtmlResponse(url=url, body=f"<html><body>{html}</body></html>".encode())
+    return {
+        request.url.rsplit("/", 1)[1]: request for request in spider.parse_gym(response)
+    }
+
+
+def _image(request):
+    with open(fixture_path(f"ocr/{request.url.rsplit('/', 1)[1]}"), "rb") as file:
+        response = Response(url=request.url, body=file.read(), request=request)
+    results = []
+    defer.ensureDeferred(request.callback(response, **request.cb_kwargs)).addCallback(
+        results.append
+    )
+    return [
+        (item.title, item.category, item.price, item.validity) for item in results[0]
+    ]
+
+
+def test_packages_of_each_page_once_its_images_are_in(spider):
+    first = _requests(
+        spider, "https://gym.test/prices", ["prices_1.png", "prices_2.png"]
+    )
+    second = _requests(spider, "https://gym.test/rental", ["prices_3.png"])
+
+    # Images of two pages in flight at once, coming in out of order
+    assert _image(first["prices_2.png"]) == []
+    assert _image(second["prices_3.png"]) == [("Shoes Rental", "eq-rental", 30, None)]
+    assert _image(first["prices_1.png"]) == [
+        ("Day Pass Adult", "day-pass", 150, None),
+        ("Day Pass Student", "day-pass", 120, "1 day"),
+        ("10 Pass", "multi-pass", 1300, "3 months"),
+    ]
+    assert len(spider.recognized) == 3
+
+
+def test_cached_images_are_not_recognized_again(spider):
+    requests = _requests(spider, "https://gym.test/prices", ["prices_1.png"])
+    _image(requests["prices_1.png"])
+    requests = _requests(spider, "https://gym.test/prices", ["prices_1.png"])
+    assert _image(requests["prices_1.png"])[0] == (
+        "Day Pass Adult",
+        "day-pass",
+        150,
+        None,
+    )
+    assert len(spider.recognized) == 1
+    assert spider.crawler.stats.get_value("ocr/cache_hit") == 1
@@ -0,0 +1,15 @@
+import pytest
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import get_project_settings
+
+from hk_climb_price.pipelines import ChangesPipeline, HistoryPipeline
+from hk_climb_price.spiders.justclimb import JustclimbPriceSpider
+
+
+@pytest.mark.parametrize("pipeline_cls", [HistoryPipeline, ChangesPipeline])
+def test_replays_are_not_recorded(pipeline_cls):
+    settings = get_project_settings()
+    settings.set("ARCHIVE_MODE", "replay")
+    with pytest.raises(NotConfigured):
+        pipeline_cls.from_crawler(Crawler(JustclimbPriceSpider, settings))
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import os
+
+from hk_climb_price.server import PriceServer
+
+GYM = {
+    "name": "Just Climb",
+    "packages": [{"title": "全日攀 Adult", "category": "day-pass", "price": 278}],
+}
+
+
+def _write(path, data):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(json.dumps(data) + "\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+
+
+def test_malformed_file_keeps_the_last_index(tmp_path):
+    path = str(tmp_path / "justclimb.json")
+    _write(path, GYM)
+    server = PriceServer(str(tmp_path))
+    index = server.index
+
+    _write(path, {"packages": GYM["packages"]})
+    assert not asyncio.run(server.reload())
+    assert server.index is index
+
+    _write(path, {**GYM, "name": "Just Climb 2"})
+    assert asyncio.run(server.reload())
+    assert server.index is not index
+
+
+def test_watch_survives_failed_reloads(tmp_path, monkeypatch):
+    server = PriceServer(str(tmp_path), interval=0)
+    calls = []
+
+    async def reload():
+        calls.append(None)
+        if len(calls) == 3:
+            raise asyncio.CancelledError
+        raise KeyError("name")
+
+    monkeypatch.setattr(server, "reload", reload)
+
+    async def watch():
+        try:
+            await server.watch()
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(watch())
+    assert len(calls) == 3
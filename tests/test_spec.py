@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from scrapy.crawler import Crawler
+from scrapy.utils.project import get_project_settings
+
+from hk_climb_price.spiders.atticv import AtticVPriceSpider
+from hk_climb_price.spiders.vermcity import JustclimbPriceSpider as VermcitySpider
+from tests.conftest import fixture_path
+
+FIELDS = ("title", "category", "tags", "currency_symbol", "price", "validity")
+
+# Packages read from the fixture pages by the parsers the specs replaced
+with open(fixture_path("spec_expected.json"), encoding="utf-8") as file:
+    EXPECTED = json.load(file)
+
+
+def _spider(spider_cls):
+    return spider_cls.from_crawler(Crawler(spider_cls, get_project_settings()))
+
+
+def _packages(spider_cls, response):
+    spider = _spider(spider_cls)
+    return [
+        {name: getattr(package, name) for name in FIELDS}
+        for package in spider.parse_gym(response)
+    ]
+
+
+@pytest.mark.parametrize("spider_cls", [AtticVPriceSpider, VermcitySpider])
+def test_spec_matches_replaced_parsers(page, spider_cls):
+    response = page(f"{spider_cls.name}.html", spider_cls.start_urls[0])
+    expected = [
+        {**package, "tags": tuple(package["tags"])}
+        for package in EXPECTED[spider_cls.name]
+    ]
+    assert _packages(spider_cls, response) == expected
+
+
+def test_atticv_strips_no_break_spaces_of_adult_day_pass_only(page):
+    response = page("atticv.html", AtticVPriceSpider.start_urls[0])
+    adult, student = _packages(AtticVPriceSpider, response)[:2]
+    assert adult["currency_symbol"] == "$"
+    assert student["currency_symbol"] == "$\xa0"
+
+
+def test_missing_tags_are_left_out(page):
+    response = page(
+        "vermcity.html",
+        VermcitySpider.start_urls[0],
+        replace=(("<p>t4</p>", ""), ("<p>需預約</p>", "")),
+    )
+    spider = _spider(VermcitySpider)
+    packages = list(spider.parse_gym(response))
+    assert not spider.crawler.stats.get_value("gym/parser_errors")
+    assert packages[0].tags == ("t1", "t2", "t3")
+    assert packages[1].tags == ()
+
+
+def test_missing_atticv_tags_are_left_out(page):
+    response = page(
+        "atticv.html",
+        AtticVPriceSpider.start_urls[0],
+        replace=(("<p>Including shoes</p>", ""),),
+    )
+    spider = _spider(AtticVPriceSpider)
+    packages = list(spider.parse_gym(response))
+    assert not spider.crawler.stats.get_value("gym/parser_errors")
+    assert packages[0].tags == ()
+    assert len(packages) == len(EXPECTED["atticv"])
@@ -0,0 +1,105 @@
+from typing import Any, Dict, Optional, Tuple
+
+import pytest
+from scrapy.crawler import Crawler
+from scrapy.http import HtmlResponse
+from scrapy.utils.project import get_project_settings
+
+from hk_climb_price.spiders.atticv import CATEGORIES, AtticVPriceSpider
+from hk_climb_price.spiders.vermcity import CATEGORIES as VERMCITY_CATEGORIES
+from hk_climb_price.structured import (
+    JsonLdExtractor,
+    StructuredExtractor,
+    WixPricingPlansExtractor,
+)
+from tests.conftest import fixture_path
+
+
+def _response(name: str, script: str) -> HtmlResponse:
+    with open(fixture_path(f"structured/{name}"), encoding="utf-8") as file:
+        payload = file.read()
+    html = f"<html><head>{script.format(payload)}</head><body></body></html>"
+    return HtmlResponse(url="https://gym.test/", body=html.encode("utf-8"))
+
+
+def _json_ld(name: str) -> HtmlResponse:
+    return _response(name, "<script type='application/ld+json'>{}</script>")
+
+
+def _fields(packages):
+    return [
+        (package.title, package.category, package.price, package.validity)
+        for package in packages
+    ]
+
+
+@pytest.mark.parametrize(
+    "categories, title, expected",
+    [
+        (CATEGORIES, "Day Pass Adult", "day-pass"),
+        (CATEGORIES, "全日 Pass", "day-pass"),
+        (CATEGORIES, "10 Pass", "multi-pass"),
+        (CATEGORIES, "5 Share Pass", "share-pass"),
+        (CATEGORIES, "Holiday Rental", "eq-rental"),
+        (VERMCITY_CATEGORIES, "Day Pass", "day-pass"),
+        (VERMCITY_CATEGORIES, "日票 (1次)", "day-pass"),
+        (VERMCITY_CATEGORIES, "10次套票", "share-pass"),
+        (VERMCITY_CATEGORIES, "Clip n Climb 1節", "section-pass"),
+    ],
+)
+def test_category_rules(categories, title, expected):
+    assert JsonLdExtractor(categories).category(title) == expected
+
+
+def test_json_ld_offers_of_product_with_several_types():
+    packages = JsonLdExtractor(CATEGORIES).extract(_json_ld("squarespace_product.json"))
+    assert _fields(packages) == [
+        ("Passes Day Pass Adult", "day-pass", 150, None),
+        ("Passes Day Pass Student", "day-pass", 120, None),
+        ("Passes 10 Pass", "multi-pass", 1300, "3 months"),
+    ]
+    assert packages[0].tags == ("Shoes rental extra",)
+
+
+def test_json_ld_aggregate_offer_without_offers():
+    packages = JsonLdExtractor(CATEGORIES).extract(
+        _json_ld("squarespace_aggregate.json")
+    )
+    assert _fields(packages) == [("Day Pass", "day-pass", 150, None)]
+
+
+def test_wix_pricing_plans():
+    response = _response(
+        "wix_pricing_plans.json", "<script id='wix-warmup-data'>{}</script>"
+    )
+    packages = WixPricingPlansExtractor(CATEGORIES).extract(response)
+    assert _fields(packages) == [
+        ("10 Pass", "multi-pass", 1300, "3 months"),
+        ("Monthly Pass", "multi-pass", 900, None),
+    ]
+    assert packages[0].tags == ("Valid for 3 months",)
+
+
+class BrokenExtractor(StructuredExtractor):
+    scripts = "script[type='application/ld+json']::text"
+
+    def package(self, node: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], ...]]:
+        raise KeyError("offers")
+
+
+def test_failing_extractor_falls_back_to_the_dom_parsers(page):
+    response = page(
+        "atticv.html",
+        AtticVPriceSpider.start_urls[0],
+        replace=(("</body>", "<script type='application/ld+json'>{}</script></body>"),),
+    )
+    settings = get_project_settings()
+    settings.set("FINGERPRINT_ENABLED", False)
+    spider = AtticVPriceSpider.from_crawler(Crawler(AtticVPriceSpider, settings))
+    spider.extractors = (BrokenExtractor(CATEGORIES), *spider.extractors)
+
+    packages = list(spider.parse(response))
+    assert packages == list(spider.parse_gym(response))
+    assert len(packages) > 0
+    assert spider.crawler.stats.get_value("structured/errors") == 1
+    assert spider.crawler.stats.get_value("structured/missing") == 1